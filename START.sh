@@ -7,13 +7,16 @@ echo "📦 Starting FastAPI backend..."
 cd backend
 source venv/bin/activate 2>/dev/null || python -m venv venv && source venv/bin/activate
 pip install -r requirements.txt
-python database.py  # Initialize database
+python database.py  # Create tables and seed templates; safe to re-run
 uvicorn main:app --reload --host 0.0.0.0 --port 8000 &
 BACKEND_PID=$!
 
-# Wait for backend to start
+# Wait for backend warm-up to finish
 echo "⏳ Waiting for backend to start..."
-sleep 5
+for _ in $(seq 1 60); do
+    curl -sf http://localhost:8000/ready > /dev/null && break
+    sleep 0.5
+done
 
 # Start frontend server
 echo "🎨 Starting Next.js frontend..."
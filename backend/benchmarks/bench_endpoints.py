@@ -0,0 +1,60 @@
+"""In-process end-to-end benchmarks of the HTTP endpoints at several store sizes"""
+import time
+
+from fastapi.testclient import TestClient
+
+from harness import measure, use_temp_database
+from corpus import PROMPTS, SAMPLE
+
+use_temp_database()
+
+import main
+
+STORE_SIZES = (0, 1000, 10000)
+QUICK_STORE_SIZES = (0, 1000)
+
+
+def fill_store(size: int):
+    """Reset the project store to ``size`` projects spread over the corpus"""
+    main.projects.clear()
+    main.prompt_cache.clear()
+    names = list(PROMPTS)
+    for i in range(size):
+        main.create_website(main.WebsiteRequest(prompt=f"{PROMPTS[names[i % len(names)]]} {i}"))
+
+
+def run(quick: bool = False) -> dict:
+    number = 10 if quick else 100
+    results = {}
+
+    # Measure the server's own cost, not admission control or cache reuse
+    main.rate_limiter.rate = 0
+    cache_size = main.prompt_cache.max_entries
+
+    with TestClient(main.app) as client:
+        while client.get("/ready").status_code != 200:
+            time.sleep(0.01)
+        for size in QUICK_STORE_SIZES if quick else STORE_SIZES:
+            fill_store(size)
+            main.prompt_cache.max_entries = 0
+            seed = client.post("/api/generate", json={"prompt": PROMPTS["photography_all_sections"]}).json()
+
+            for name in SAMPLE:
+                body = {"prompt": PROMPTS[name]}
+                results[f"POST /api/generate[{name},store={size}]"] = measure(
+                    lambda: client.post("/api/generate", json=body), number=number
+                )
+            results[f"GET /api/preview[store={size}]"] = measure(
+                lambda: client.get(f"/api/preview/{seed['id']}"), number=number
+            )
+            results[f"GET /api/export[store={size}]"] = measure(
+                lambda: client.get(f"/api/export/{seed['id']}"), number=number
+            )
+            results[f"GET /api/projects[store={size}]"] = measure(
+                lambda: client.get("/api/projects"), number=max(number // 10, 3)
+            )
+            main.prompt_cache.max_entries = cache_size
+
+    main.projects.clear()
+    main.prompt_cache.clear()
+    return results
@@ -0,0 +1,39 @@
+"""Micro-benchmarks of the generation pipeline functions"""
+from harness import measure, use_temp_database
+from corpus import PROMPTS, SAMPLE
+
+use_temp_database()
+
+import main
+
+
+def run(quick: bool = False) -> dict:
+    number = 20 if quick else 200
+    results = {}
+
+    for name, prompt in PROMPTS.items():
+        results[f"prompt_features[{name}]"] = measure(
+            lambda: main.prompt_features(prompt), number=number
+        )
+        results[f"generate_website_content[{name}]"] = measure(
+            lambda: main.generate_website_content(prompt), number=number
+        )
+
+    for name in SAMPLE:
+        content = main.generate_website_content(PROMPTS[name])
+        components = [html for _, html in main.render_components(content)]
+        results[f"render_components[{name}]"] = measure(
+            lambda: list(main.render_components(content)), number=number
+        )
+        results[f"assemble_website[{name}]"] = measure(
+            lambda: main.assemble_website(content, components), number=number
+        )
+        results[f"build_website[{name}]"] = measure(
+            lambda: main.build_website(content), number=number
+        )
+        response = main.create_website(main.WebsiteRequest(prompt=PROMPTS[name]))
+        results[f"render_response[{name}]"] = measure(
+            lambda: main.render_response(response), number=number
+        )
+
+    return results
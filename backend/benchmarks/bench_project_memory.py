@@ -0,0 +1,95 @@
+"""Memory per project of the in-memory project store, as dicts and as records
+
+Usage: python benchmarks/bench_project_memory.py [--projects 100000]
+
+Fills a store with generated-looking projects twice: once as the plain dicts
+the store used to hold, once as ProjectRecords. Each project has its own page
+and page weight report, like real generations with distinct prompts. Memory is
+measured with tracemalloc, as what the filled store keeps allocated.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+
+import main
+from project_store import ProjectRecord, ProjectStore
+
+PROMPT = "A photography portfolio with travel and nature galleries"
+
+
+def as_dict(website_id, prompt, template, style, created, website, metadata) -> dict:
+    # The layout of store_project before ProjectRecord
+    return {
+        "id": website_id,
+        "prompt": prompt,
+        "template": template,
+        "style": style,
+        "created_at": created.isoformat(),
+        "metadata": metadata,
+        **website,
+    }
+
+
+def as_record(website_id, prompt, template, style, created, website, metadata) -> ProjectRecord:
+    return ProjectRecord(
+        website_id, prompt, template, style, created.timestamp(),
+        website["html"], website["css"], website["js"], None, metadata,
+    )
+
+
+def fill(make, count: int, content: dict, report: bytes) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = {} if make is as_dict else ProjectStore()
+    for i in range(count):
+        # Template names and styles come from request bodies, so each
+        # request brings its own string objects
+        website = main.build_website({**content, "company_name": f"Studio {i}"})
+        website_id = str(uuid.uuid4())
+        store[website_id] = make(
+            website_id, f"{PROMPT} {i}", b"portfolio".decode(), b"modern".decode(),
+            datetime.now(), website, orjson.loads(report),
+        )
+    seconds = time.perf_counter() - started
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del store
+    gc.collect()
+    return {
+        "bytes_per_project": round(retained / count),
+        "total_mb": round(retained / 1024 / 1024, 1),
+        "fill_us_per_project": round(seconds / count * 1e6, 1),
+    }
+
+
+def run_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--projects", type=int, default=100_000)
+    args = parser.parse_args()
+
+    content = main.generate_website_content(PROMPT)
+    report = orjson.dumps({"page_weight": main.page_weight.analyze(main.build_website(content))})
+    before = fill(as_dict, args.projects, content, report)
+    after = fill(as_record, args.projects, content, report)
+    print(json.dumps({
+        "projects": args.projects,
+        "dict": before,
+        "record": after,
+        "ratio": round(before["bytes_per_project"] / after["bytes_per_project"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    run_benchmark()
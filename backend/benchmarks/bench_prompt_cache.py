@@ -0,0 +1,87 @@
+"""Lookup cost of the near-duplicate prompt cache at a large index size
+
+Usage: python benchmarks/bench_prompt_cache.py [--entries 1000000] [--lookups 10000]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_cache import PromptCache
+
+VOCABULARY = [
+    "photography", "portfolio", "travel", "nature", "street", "aerial",
+    "restaurant", "cafe", "bakery", "menu", "reservations", "jewelry", "shop",
+    "business", "consulting", "agency", "startup", "law", "firm", "dentist",
+    "clinic", "yoga", "studio", "fitness", "gym", "wedding", "planner",
+    "architect", "interior", "blog", "podcast", "music", "band", "artist",
+    "gallery", "museum", "school", "tutor", "course", "hotel", "resort",
+    "modern", "minimal", "dark", "colorful", "elegant", "responsive", "seo",
+    "landing", "contact", "form", "testimonials", "pricing", "team", "careers",
+]
+# Pad the vocabulary out to the size of a realistic prompt vocabulary
+VOCABULARY += ["w%04d" % i for i in range(2000)]
+
+
+def random_prompt(rng: random.Random) -> str:
+    return " ".join(rng.sample(VOCABULARY, rng.randint(3, 8)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache = PromptCache(threshold=args.threshold, max_entries=args.entries)
+
+    indexed = []
+    sample_every = max(args.entries // args.lookups, 1)
+
+    started = time.perf_counter()
+    for i in range(args.entries):
+        prompt = random_prompt(rng)
+        cache.insert(str(i), prompt, i)
+        if i % sample_every == 0:
+            indexed.append(prompt)
+    insert_seconds = time.perf_counter() - started
+
+    # Half of the lookups reword an indexed prompt, half are fresh prompts
+    queries = []
+    for _ in range(args.lookups // 2):
+        words = rng.choice(indexed).split()
+        rng.shuffle(words)
+        queries.append(" ".join(words))
+        queries.append(random_prompt(rng))
+
+    timings = []
+    for query in queries:
+        t0 = time.perf_counter()
+        cache.lookup(query)
+        timings.append(time.perf_counter() - t0)
+    timings.sort()
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1e6
+
+    print(json.dumps({
+        "entries": len(cache),
+        "insert_us_per_entry": insert_seconds / max(args.entries, 1) * 1e6,
+        "lookup_us_mean": sum(timings) / len(timings) * 1e6,
+        "lookup_us_p50": percentile(0.50),
+        "lookup_us_p99": percentile(0.99),
+        "hit_ratio": cache.hits / max(cache.hits + cache.misses, 1),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
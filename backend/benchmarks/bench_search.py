@@ -0,0 +1,107 @@
+"""Full-text project search latency at a large table size
+
+Usage: python benchmarks/bench_search.py [--rows 1000000] [--database-url sqlite:////tmp/search.db]
+
+Fills a fresh database with synthetic projects (empty html/css/js, so the
+table size reflects the index rather than page bodies), then times ranked
+queries of different selectivity and the cost of a single indexed insert.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_prompt_cache import random_prompt
+from harness import measure
+
+QUERIES = {
+    "rare term": "w0042",
+    "common term": "photography",
+    "two terms": "restaurant menu",
+    "prefix": "photo",
+    "template/style": "portfolio modern",
+    "no match": "zzzzzz",
+}
+STYLES = ("modern", "minimal", "classic", "bold")
+TEMPLATES = (None, "portfolio", "business", "ecommerce", "restaurant")
+
+
+def fill(database, rows: int, rng: random.Random, batch: int = 10000):
+    table = database.Project.__table__
+    now = datetime.now()
+    engine = database.get_engine()
+    for start in range(0, rows, batch):
+        values = [
+            {
+                "id": "p%09d" % i,
+                "prompt": random_prompt(rng),
+                "template": rng.choice(TEMPLATES),
+                "style": rng.choice(STYLES),
+                "html": "", "css": "", "js": "",
+                "created_at": now,
+            }
+            for i in range(start, min(start + batch, rows))
+        ]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), values)
+        print(f"\r{min(start + batch, rows)} rows", end="", file=sys.stderr)
+    print(file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--database-url", help="empty database to fill (default: temporary SQLite file)")
+    parser.add_argument("--number", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp.name, 'search.db')}"
+    import database
+    import search
+
+    database.init_db()
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    fill(database, args.rows, rng)
+    fill_seconds = time.perf_counter() - started
+
+    results = {}
+    db = database.SessionLocal()
+    try:
+        for name, query in QUERIES.items():
+            results[f"search[{name}]"] = measure(
+                lambda: search.search_projects(db, query, 21, 0), number=args.number, repeat=3
+            )
+        results["search[common term, offset 1000]"] = measure(
+            lambda: search.search_projects(db, QUERIES["common term"], 21, 1000), number=args.number, repeat=3
+        )
+    finally:
+        db.close()
+
+    counter = iter(range(10**9))
+    results["insert one project"] = measure(
+        lambda: database.save_project({
+            "id": "new%09d" % next(counter), "prompt": random_prompt(rng), "template": None,
+            "style": "modern", "html": "", "css": "", "js": "", "created_at": datetime.now(),
+        }),
+        number=args.number, repeat=3,
+    )
+
+    print(json.dumps({"rows": args.rows, "fill_seconds": round(fill_seconds, 1), "results": results}, indent=2))
+    for name, stats in results.items():
+        print(f"{name:40} p50 {stats['p50_us'] / 1000:>9.2f} ms  p95 {stats['p95_us'] / 1000:>9.2f} ms", file=sys.stderr)
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
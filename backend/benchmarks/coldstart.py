@@ -0,0 +1,85 @@
+"""Measure cold start: process launch to first served request and to readiness
+
+Usage:
+    python benchmarks/coldstart.py --runs 5
+    python benchmarks/coldstart.py --runs 5 --database-url sqlite:////tmp/existing.db
+
+Each run starts the backend under uvicorn and polls ``/`` (first request
+served) and then ``/ready`` (warm-up finished). Unless --database-url is
+given, every run gets an empty SQLite database, so the timings include
+creating the schema and seeding templates. The import time of ``main`` is
+measured separately in a fresh interpreter.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadtest import BACKEND_DIR, Server, free_port
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def import_seconds(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=dict(os.environ, **env), capture_output=True, text=True, check=True,
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+async def start_once(env: dict) -> dict:
+    started = time.perf_counter()
+    server = Server(free_port(), 1, keep_rate_limit=True, extra_env=env)
+    try:
+        await server.wait_ready("/", interval=0.005)
+        first_request = time.perf_counter() - started
+        await server.wait_ready("/ready", interval=0.005)
+        ready = time.perf_counter() - started
+    finally:
+        server.stop()
+    return {"first_request_ms": round(first_request * 1000, 1), "ready_ms": round(ready * 1000, 1)}
+
+
+def summarize(values: list) -> dict:
+    return {"median": round(statistics.median(values), 1), "min": round(min(values), 1), "max": round(max(values), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", help="reuse this database instead of a fresh one per run")
+    parser.add_argument("--output", help="write the runs and summary as JSON")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.runs):
+            database_url = args.database_url or f"sqlite:///{os.path.join(tmp, f'run{i}.db')}"
+            env = {"DATABASE_URL": database_url}
+            run = {"import_ms": round(import_seconds(env) * 1000, 1)}
+            run.update(asyncio.run(start_once(env)))
+            runs.append(run)
+            print(
+                f"run {i + 1}: import {run['import_ms']} ms, first request {run['first_request_ms']} ms, "
+                f"ready {run['ready_ms']} ms",
+                file=sys.stderr,
+            )
+
+    report = {"runs": runs, "summary": {key: summarize([run[key] for run in runs]) for key in runs[0]}}
+    for key, stats in report["summary"].items():
+        print(f"{key:18} median {stats['median']:>8} ms  min {stats['min']:>8} ms  max {stats['max']:>8} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
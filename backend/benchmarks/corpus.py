@@ -0,0 +1,26 @@
+# Representative prompts for the benchmarks, grouped by the generator branch they exercise
+PROMPTS = {
+    "short_generic": "A website",
+    "long_generic": (
+        "I would like a clean and welcoming website for my small neighbourhood "
+        "bookshop. It should have a warm colour palette, a section about our "
+        "history since 1985, opening hours, upcoming author events, a newsletter "
+        "signup, a map with directions, and a contact form for special orders. "
+        "Please make it easy to read on phones and tablets as well as desktops."
+    ),
+    "photography": "Create a photography portfolio",
+    "photography_travel": "Photography portfolio with my travel shots",
+    "photography_all_sections": (
+        "Modern responsive photography portfolio with travel, nature, street "
+        "and aerial galleries, SEO friendly"
+    ),
+    "ecommerce_jewelry": "An ecommerce store for handmade jewelry",
+    "restaurant": "Design a restaurant website with menu and reservations",
+    "cafe": "A cosy cafe with seasonal drinks",
+    "business": "Make a business consulting website with services",
+    "corporate_minimal": "Minimal corporate site for a law firm",
+    "modern_seo": "A modern, responsive landing page with good SEO",
+}
+
+# One prompt per group, for benchmarks that only need a cross-section
+SAMPLE = ["short_generic", "long_generic", "photography_all_sections", "restaurant", "business"]
@@ -0,0 +1,90 @@
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+_database_dir = None
+
+
+def use_temp_database() -> str:
+    """Point the app at a fresh SQLite database with its tables created
+
+    Generated projects are persisted, so suites that generate must call this
+    before importing ``main``; it keeps them out of the development database.
+    Every suite in the process shares the one database, which is removed on
+    exit. Returns its directory.
+    """
+    global _database_dir
+    if _database_dir is None:
+        _database_dir = tempfile.mkdtemp(prefix="bench-")
+        atexit.register(shutil.rmtree, _database_dir, ignore_errors=True)
+        os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_database_dir, "bench.db")
+        import database
+        database.init_db()
+    return _database_dir
+
+
+def measure(fn, *, number: int = 100, repeat: int = 5) -> dict:
+    """Time ``fn`` and summarize the per-call cost in microseconds
+
+    Each of the ``repeat`` rounds calls ``fn`` ``number`` times; the
+    percentiles are taken over the per-call timings of every call.
+    """
+    fn()  # warm up caches and lazy imports
+    timings = []
+    for _ in range(repeat):
+        for _ in range(number):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1e6
+
+    mean = statistics.fmean(timings)
+    return {
+        "calls": len(timings),
+        "mean_us": round(mean * 1e6, 3),
+        "p50_us": round(percentile(0.50), 3),
+        "p95_us": round(percentile(0.95), 3),
+        "min_us": round(timings[0] * 1e6, 3),
+        "ops_per_sec": round(1 / mean, 1) if mean else None,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return (name, baseline p50, current p50, ratio, regressed) rows"""
+    rows = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        ratio = current["p50_us"] / previous["p50_us"] if previous["p50_us"] else float("inf")
+        rows.append((name, previous["p50_us"], current["p50_us"], ratio, ratio > 1 + tolerance))
+    return rows
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
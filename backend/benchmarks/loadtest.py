@@ -0,0 +1,328 @@
+"""Load-test the API under uvicorn and report throughput, latency percentiles and RSS
+
+Usage:
+    python benchmarks/loadtest.py --concurrency 16 --duration 30
+    python benchmarks/loadtest.py --rate 200 --mix generate=1,preview=6,export=2,list=1
+    python benchmarks/loadtest.py --url http://staging:8000 --concurrency 32
+
+Without --url the backend is started locally under uvicorn on a free port and
+stopped afterwards. Rate limiting is switched off for the spawned server,
+since all traffic comes from one client, unless --keep-rate-limit is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import PROMPTS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ("generate", "preview", "export", "list")
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    ordered = sorted(samples)
+
+    def at(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": round(ordered[-1] * 1000, 3)}
+
+
+class Server:
+    """The backend running under uvicorn in a child process"""
+
+    def __init__(self, port: int, workers: int, keep_rate_limit: bool, extra_env: dict = None):
+        env = dict(os.environ, **(extra_env or {}))
+        if not keep_rate_limit:
+            env["RATE_LIMIT_PER_MINUTE"] = "0"
+        self.url = f"http://127.0.0.1:{port}"
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def rss_mb(self):
+        # With several workers the master process is only a supervisor, so sum the tree
+        total = rss_mb(self.pid)
+        children = f"/proc/{self.pid}/task/{self.pid}/children"
+        if total is not None and os.path.exists(children):
+            with open(children) as f:
+                for child in f.read().split():
+                    total += rss_mb(int(child)) or 0
+        return total
+
+    async def wait_ready(self, path: str = "/ready", timeout: float = 30, interval: float = 0.1):
+        """Poll ``path`` until it answers 200; return the seconds spent waiting"""
+        started = time.perf_counter()
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient() as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                try:
+                    if (await client.get(self.url + path)).status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(interval)
+        raise RuntimeError("server did not become ready in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, mix: dict, seed: int):
+        self.client = client
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.rng = random.Random(seed)
+        self.prompts = list(PROMPTS.values())
+        self.project_ids = []
+        self.samples = []  # (finished at, operation, seconds, ok)
+
+    async def seed_projects(self, count: int):
+        for i in range(count):
+            response = await self.client.post(
+                "/api/generate", json={"prompt": f"{self.prompts[i % len(self.prompts)]} {i}"}
+            )
+            response.raise_for_status()
+            self.project_ids.append(response.json()["id"])
+
+    async def request_once(self):
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        started = time.perf_counter()
+        ok = False
+        try:
+            if operation == "generate":
+                prompt = f"{self.rng.choice(self.prompts)} {self.rng.random()}"
+                response = await self.client.post("/api/generate", json={"prompt": prompt})
+                if response.status_code == 200:
+                    self.project_ids.append(response.json()["id"])
+            elif operation == "preview":
+                response = await self.client.get(f"/api/preview/{self.rng.choice(self.project_ids)}")
+            elif operation == "export":
+                response = await self.client.get(f"/api/export/{self.rng.choice(self.project_ids)}")
+            else:
+                response = await self.client.get("/api/projects")
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            pass
+        self.samples.append((time.perf_counter(), operation, time.perf_counter() - started, ok))
+
+    async def run_closed(self, concurrency: int, duration: float):
+        """Keep ``concurrency`` requests outstanding until ``duration`` elapses"""
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self.request_once()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    async def run_open(self, rate: float, duration: float, max_outstanding: int):
+        """Start requests at ``rate`` per second regardless of how fast they finish"""
+        started = time.perf_counter()
+        slots = asyncio.Semaphore(max_outstanding)
+        tasks = set()
+        sent = 0
+
+        async def fire():
+            try:
+                await self.request_once()
+            finally:
+                slots.release()
+
+        while True:
+            now = time.perf_counter() - started
+            if now >= duration:
+                break
+            due = int(now * rate) + 1
+            while sent < due:
+                await slots.acquire()
+                task = asyncio.create_task(fire())
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                sent += 1
+            await asyncio.sleep(min(1 / rate, 0.01))
+        await asyncio.gather(*tasks)
+
+
+async def sample_rss(server, interval: float, timeline: list, stop: asyncio.Event):
+    started = time.perf_counter()
+    while not stop.is_set():
+        timeline.append((round(time.perf_counter() - started, 3), server.rss_mb()))
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def build_report(args, test: LoadTest, started: float, elapsed: float, rss: list) -> dict:
+    samples = test.samples
+    operations = {}
+    for name in test.operations:
+        own = [s for s in samples if s[1] == name]
+        operations[name] = {
+            "requests": len(own),
+            "errors": sum(not s[3] for s in own),
+            **percentiles([s[2] for s in own if s[3]]),
+        }
+
+    timeline = []
+    seconds = int(elapsed) + 1
+    for second in range(seconds):
+        window = [s for s in samples if second <= s[0] - started < second + 1]
+        rss_now = [mb for t, mb in rss if second <= t < second + 1 and mb is not None]
+        timeline.append({
+            "second": second,
+            "requests": len(window),
+            "errors": sum(not s[3] for s in window),
+            "p99_ms": percentiles([s[2] for s in window if s[3]])["p99_ms"],
+            "rss_mb": round(max(rss_now), 1) if rss_now else None,
+        })
+
+    errors = sum(not s[3] for s in samples)
+    rss_values = [mb for _, mb in rss if mb is not None]
+    return {
+        "config": {
+            "url": args.url,
+            "mode": "open" if args.rate else "closed",
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": dict(zip(test.operations, test.weights)),
+            "workers": args.workers,
+        },
+        "summary": {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+            "error_rate": round(errors / len(samples), 4) if samples else None,
+            **percentiles([s[2] for s in samples if s[3]]),
+            "rss_mb_max": round(max(rss_values), 1) if rss_values else None,
+        },
+        "operations": operations,
+        "timeline": timeline,
+    }
+
+
+async def main_async(args) -> dict:
+    server = None
+    database_dir = None
+    if not args.url:
+        # Generated projects are persisted; keep them out of the development database
+        database_dir = tempfile.mkdtemp(prefix="loadtest-")
+        database_url = "sqlite:///" + os.path.join(database_dir, "loadtest.db")
+        server = Server(free_port(), args.workers, args.keep_rate_limit, {"DATABASE_URL": database_url})
+        args.url = server.url
+    try:
+        if server:
+            await server.wait_ready()
+
+        limits = httpx.Limits(max_connections=max(args.concurrency, 100))
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+            test = LoadTest(client, args.mix, args.seed)
+            await test.seed_projects(args.seed_projects)
+
+            rss, stop = [], asyncio.Event()
+            sampler = asyncio.create_task(sample_rss(server, 0.5, rss, stop)) if server else None
+
+            started = time.perf_counter()
+            if args.rate:
+                await test.run_open(args.rate, args.duration, args.max_outstanding)
+            else:
+                await test.run_closed(args.concurrency, args.duration)
+            elapsed = time.perf_counter() - started
+
+            stop.set()
+            if sampler:
+                await sampler
+            return build_report(args, test, started, elapsed, rss)
+    finally:
+        if server:
+            server.stop()
+            shutil.rmtree(database_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local server")
+    parser.add_argument("--rate", type=float, help="open-loop target requests per second")
+    parser.add_argument("--concurrency", type=int, default=8, help="closed-loop outstanding requests")
+    parser.add_argument("--max-outstanding", type=int, default=1000, help="cap on in-flight requests in rate mode")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of measured load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate=1,preview=4,export=2,list=1"))
+    parser.add_argument("--seed-projects", type=int, default=20, help="projects generated before the run")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-rate-limit", action="store_true")
+    parser.add_argument("--output", default="loadtest-report.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    summary = report["summary"]
+    print(
+        f"{summary['requests']} requests, {summary['throughput_rps']} req/s, "
+        f"error rate {summary['error_rate']}, p50 {summary['p50_ms']} ms, "
+        f"p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms, max RSS {summary['rss_mb_max']} MB",
+        file=sys.stderr,
+    )
+    print(f"report written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
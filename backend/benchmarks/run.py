@@ -0,0 +1,57 @@
+"""Run the benchmark suite and optionally compare it against a saved baseline
+
+Usage:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline baseline.json [--tolerance 0.10] [--fail-on-regression]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import harness
+
+SUITES = ("pipeline", "endpoints")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the website generation pipeline and API")
+    parser.add_argument("--suite", choices=SUITES, action="append", help="suite to run (default: all)")
+    parser.add_argument("--quick", action="store_true", help="fewer iterations and smaller stores")
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed p50 slowdown ratio")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    for suite in args.suite or SUITES:
+        module = __import__(f"bench_{suite}")
+        print(f"running {suite} benchmarks...", file=sys.stderr)
+        results.update(module.run(quick=args.quick))
+
+    with open(args.output, "w") as f:
+        json.dump({"environment": harness.environment(), "results": results}, f, indent=2)
+    print(f"wrote {len(results)} results to {args.output}", file=sys.stderr)
+
+    if not args.baseline:
+        for name, stats in results.items():
+            print(f"{name:70} p50 {stats['p50_us']:>12.1f} us  p95 {stats['p95_us']:>12.1f} us")
+        return
+
+    rows = harness.compare(results, harness.load(args.baseline)["results"], args.tolerance)
+    regressions = 0
+    for name, before, after, ratio, regressed in rows:
+        regressions += regressed
+        flag = "REGRESSED" if regressed else ""
+        print(f"{name:70} {before:>12.1f} -> {after:>12.1f} us  x{ratio:5.2f} {flag}")
+    print(f"{regressions} regression(s) beyond {args.tolerance:.0%}", file=sys.stderr)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from typing import Dict, Optional
+import logging
+import os
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+class CompiledComponent:
+    """A component file split once into literal text and {{placeholder}} names"""
+
+    __slots__ = ("name", "literals", "keys", "stamp")
+
+    def __init__(self, name: str, text: str, stamp: tuple = None):
+        self.name = name
+        # split() alternates literal, key, literal, ... and always starts and
+        # ends with a literal
+        parts = PLACEHOLDER.split(text)
+        self.literals = tuple(parts[0::2])
+        self.keys = tuple(parts[1::2])
+        self.stamp = stamp
+
+    def render(self, content: dict) -> str:
+        """Fill placeholders from the content's string values; others are left as is"""
+        if not self.keys:
+            return self.literals[0]
+        pieces = [self.literals[0]]
+        for key, literal in zip(self.keys, self.literals[1:]):
+            value = content.get(key)
+            pieces.append(value if isinstance(value, str) else "{{%s}}" % key)
+            pieces.append(literal)
+        return "".join(pieces)
+
+
+class ComponentLibrary:
+    """Compiled ``*.html`` components from a directory, hot-reloaded on change
+
+    Lookups only read a dict. :meth:`refresh` stats the directory, compiles
+    new or changed files and swaps in a new dict, so requests never wait on
+    disk or compilation. :meth:`watch` runs ``refresh`` periodically on a
+    background thread.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.reloads = 0
+        self._components: Dict[str, CompiledComponent] = {}
+        # Stamp of each file that failed to load, so it is retried once edited
+        self._failed: Dict[str, tuple] = {}
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.refresh()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._components
+
+    def get(self, name: str) -> Optional[CompiledComponent]:
+        return self._components.get(name)
+
+    def __getitem__(self, name: str) -> CompiledComponent:
+        component = self._components.get(name)
+        if component is None:
+            raise KeyError(f"component {name!r} not found in {self.directory}")
+        return component
+
+    def refresh(self) -> bool:
+        """Recompile files whose mtime or size changed; return True if anything did"""
+        with self._refresh_lock:
+            current = self._components
+            updated = {}
+            changed = False
+            try:
+                entries = [entry for entry in os.scandir(self.directory)
+                           if entry.name.endswith(".html") and entry.is_file()]
+            except OSError:
+                logger.exception("cannot read component directory %s", self.directory)
+                return False
+
+            for entry in entries:
+                name = entry.name[:-len(".html")]
+                previous = current.get(name)
+                stamp = None
+                try:
+                    stat = entry.stat()
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                    if previous is not None and previous.stamp == stamp:
+                        updated[name] = previous
+                        continue
+                    if self._failed.get(name) == stamp:
+                        # Already logged; wait for the next edit
+                        if previous is not None:
+                            updated[name] = previous
+                        continue
+                    with open(entry.path, encoding="utf-8") as f:
+                        updated[name] = CompiledComponent(name, f.read(), stamp)
+                except (OSError, ValueError):
+                    # ValueError covers UnicodeDecodeError; the last good
+                    # version, if any, stays in use
+                    logger.exception("cannot read component %s", entry.path)
+                    self._failed[name] = stamp
+                    if previous is not None:
+                        updated[name] = previous
+                    continue
+                self._failed.pop(name, None)
+                changed = True
+
+            if changed or updated.keys() != current.keys():
+                self._components = updated
+                self.reloads += 1
+                return True
+            return False
+
+    def watch(self, interval: float):
+        """Poll the directory every ``interval`` seconds on a daemon thread"""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=loop, name="component-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
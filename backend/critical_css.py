@@ -0,0 +1,135 @@
+"""Extracts the CSS rules needed to render a fragment of a page
+
+Used to inline only the styles of the content visible on first paint and
+load the full stylesheet without blocking rendering. Matching is by the
+class names, ids and tags that appear in the fragment's markup; a rule is
+kept when any of its selectors could match, so the result errs towards
+including too much rather than too little. Pseudo-classes are ignored,
+which keeps ``:hover`` and similar rules with their elements.
+"""
+from typing import List, Tuple, Union
+import re
+import threading
+
+COMMENT = re.compile(r"/\*.*?\*/", re.S)
+WHITESPACE = re.compile(r"\s+")
+CLASS_ATTRIBUTE = re.compile(r' class="([^"]*)"')
+ID_ATTRIBUTE = re.compile(r' id="([^"]*)"')
+TAG = re.compile(r"<([a-zA-Z][\w-]*)")
+PSEUDO = re.compile(r"::?[\w-]+(?:\([^)]*\))?")
+ATTRIBUTE_SELECTOR = re.compile(r"\[[^\]]*\]")
+SELECTOR_CLASS = re.compile(r"\.([\w-]+)")
+SELECTOR_ID = re.compile(r"#([\w-]+)")
+SELECTOR_TAG = re.compile(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)")
+ANIMATION = re.compile(r"animation(?:-name)?\s*:\s*([^;}]+)")
+# Groups whose contents are rules of their own
+NESTING_AT_RULES = ("@media", "@supports")
+
+# A rule is (prelude, body); a group's body is a list of rules
+Rule = Tuple[str, Union[str, list]]
+
+
+def _matching_brace(css: str, start: int) -> int:
+    depth = 0
+    for i in range(start, len(css)):
+        if css[i] == "{":
+            depth += 1
+        elif css[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("unbalanced braces in stylesheet")
+
+
+def parse(css: str) -> List[Rule]:
+    """Split a stylesheet into rules, with @media and @supports bodies parsed too"""
+    css = COMMENT.sub("", css)
+    rules = []
+    position = 0
+    while True:
+        brace = css.find("{", position)
+        if brace < 0:
+            return rules
+        prelude = WHITESPACE.sub(" ", css[position:brace]).strip()
+        end = _matching_brace(css, brace)
+        body = css[brace + 1:end]
+        if prelude.startswith(NESTING_AT_RULES):
+            rules.append((prelude, parse(body)))
+        else:
+            rules.append((prelude, WHITESPACE.sub(" ", body).strip()))
+        position = end + 1
+
+
+def render(rules: List[Rule]) -> str:
+    return "".join(
+        f"{prelude}{{{render(body) if isinstance(body, list) else body}}}" for prelude, body in rules
+    )
+
+
+def page_tokens(html: str) -> Tuple[frozenset, frozenset, frozenset]:
+    """The class names, ids and tag names used in a fragment of markup"""
+    classes = frozenset(name for value in CLASS_ATTRIBUTE.findall(html) for name in value.split())
+    ids = frozenset(ID_ATTRIBUTE.findall(html))
+    tags = frozenset(tag.lower() for tag in TAG.findall(html)) | {"html", "body"}
+    return classes, ids, tags
+
+
+def selector_matches(selector: str, classes: frozenset, ids: frozenset, tags: frozenset) -> bool:
+    simple = ATTRIBUTE_SELECTOR.sub("", PSEUDO.sub("", selector))
+    return (
+        all(name in classes for name in SELECTOR_CLASS.findall(simple))
+        and all(name in ids for name in SELECTOR_ID.findall(simple))
+        and all(tag.lower() in tags for tag in SELECTOR_TAG.findall(simple))
+    )
+
+
+def critical_rules(rules: List[Rule], tokens: Tuple[frozenset, frozenset, frozenset]) -> List[Rule]:
+    kept = []
+    for prelude, body in rules:
+        if isinstance(body, list):
+            inner = critical_rules(body, tokens)
+            if inner:
+                kept.append((prelude, inner))
+        elif prelude.startswith("@font-face"):
+            kept.append((prelude, body))
+        elif not prelude.startswith("@") and any(
+            selector_matches(selector, *tokens) for selector in prelude.split(",")
+        ):
+            kept.append((prelude, body))
+
+    # Keyframes only travel with the rules that animate with them
+    used = set()
+    for match in ANIMATION.finditer(render(kept)):
+        used.update(match.group(1).replace(",", " ").split())
+    for prelude, body in rules:
+        if prelude.startswith(("@keyframes", "@-webkit-keyframes")) and prelude.split()[-1] in used:
+            kept.append((prelude, body))
+    return kept
+
+
+class CriticalCSS:
+    """Critical CSS of one stylesheet, cached per set of classes, ids and tags used
+
+    Pages built from the same components share a token set, so extraction
+    runs once per layout; afterwards a call costs one scan of the fragment.
+    """
+
+    def __init__(self, css: str, max_entries: int = 256):
+        self.rules = parse(css)
+        self.max_entries = max_entries
+        self.computed = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def for_html(self, html: str) -> str:
+        tokens = page_tokens(html)
+        cached = self._cache.get(tokens)
+        if cached is not None:
+            return cached
+        css = render(critical_rules(self.rules, tokens))
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._cache.clear()
+            self._cache[tokens] = css
+            self.computed += 1
+        return css
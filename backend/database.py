@@ -1,13 +1,83 @@
-from sqlalchemy import create_engine, Column, String, DateTime, Text, JSON
+from sqlalchemy import create_engine, event, inspect, select, text, false, Boolean, Column, Integer, String, DateTime, Text, JSON
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from sqlalchemy.orm import declarative_base, sessionmaker
 from datetime import datetime
 import os
+import threading
+
+from replicas import ReplicaSet
+from search import init_search
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./website_generator.db")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Read replicas: comma-separated URLs of databases replicating DATABASE_URL.
+# Reads that can be slightly stale go to the healthy ones in turn, writes
+# always go to DATABASE_URL. A replica more than REPLICA_MAX_LAG seconds
+# behind is left out, and a project this worker wrote in the last
+# READ_YOUR_WRITES_SECONDS is read from the primary
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "10"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "30"))
+
+# The engine is created on first use, so importing this module stays cheap
+_engine = None
+_replicas = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+def _create_engine(url: str):
+    connect_args = {}
+    if url.startswith("sqlite"):
+        # Sessions are opened from the threadpool, not the importing thread
+        connect_args["check_same_thread"] = False
+    engine = create_engine(url, connect_args=connect_args)
+    if url.startswith("sqlite") and ":memory:" not in url:
+        event.listen(engine, "connect", _sqlite_pragmas)
+    return engine
+
+def get_engine():
+    """Return the shared engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = _create_engine(DATABASE_URL)
+                _session_factory.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+def get_replicas() -> ReplicaSet:
+    """Return the read routing between the primary and its replicas, creating it on first use"""
+    global _replicas
+    if _replicas is None:
+        primary = get_engine()
+        with _engine_lock:
+            if _replicas is None:
+                _replicas = ReplicaSet(
+                    primary,
+                    [_create_engine(url) for url in DATABASE_REPLICA_URLS],
+                    select(Project.id).limit(1),
+                    max_lag=REPLICA_MAX_LAG,
+                    sticky_seconds=READ_YOUR_WRITES_SECONDS,
+                )
+    return _replicas
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the writer and makes each commit a
+    # cheap append instead of a journal rewrite
+    cursor = dbapi_connection.cursor()
+    # Lets retention hand freed pages back to the filesystem; only takes
+    # effect on a new database file, or after a full VACUUM
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+def SessionLocal():
+    """Open a new session on the shared engine"""
+    get_engine()
+    return _session_factory()
 
 Base = declarative_base()
 
@@ -23,7 +93,12 @@ class Project(Base):
     css = Column(Text, nullable=False)
     js = Column(Text, nullable=False)
     meta_data = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # {file name: html} of multi-page sites; html then holds the home page
+    pages = Column(JSON, nullable=True)
+    # Pinned projects are exempt from retention
+    pinned = Column(Boolean, nullable=False, default=False, server_default=false())
+    # Indexed for incremental export and age-based queries
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 class Template(Base):
     __tablename__ = "templates"
@@ -34,8 +109,13 @@ class Template(Base):
     components = Column(JSON, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+class RegistryVersion(Base):
+    """Version counter per cached dataset, so every worker can tell when to reload"""
+    __tablename__ = "registry_versions"
+    
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
 # Database dependency
 def get_db():
@@ -45,49 +125,172 @@ def get_db():
     finally:
         db.close()
 
+def read_session(work):
+    """Run ``work(session)`` on a session bound to a replica, or to the primary"""
+    def query(conn):
+        db = _session_factory(bind=conn)
+        try:
+            return work(db)
+        finally:
+            db.close()
+    return get_replicas().read(query)
+
+def save_project(values: dict):
+    """Insert one project row; the search index is updated by the database"""
+    with get_engine().begin() as conn:
+        conn.execute(Project.__table__.insert(), values)
+    get_replicas().wrote(values["id"])
+
+def load_project(project_id: str):
+    """Fetch one stored project as a dict, or None"""
+    def query(conn):
+        return conn.execute(
+            Project.__table__.select().where(Project.id == project_id)
+        ).mappings().first()
+    # A project another worker just wrote may not have reached the replica yet
+    row = get_replicas().read(query, project_id, stale=lambda row: row is None)
+    return dict(row) if row else None
+
+def set_pinned(project_id: str, pinned: bool) -> bool:
+    """Pin or unpin a stored project; False if it does not exist"""
+    with get_engine().begin() as conn:
+        result = conn.execute(
+            Project.__table__.update().where(Project.id == project_id).values(pinned=pinned)
+        )
+    get_replicas().wrote(project_id)
+    return result.rowcount > 0
+
+def existing_project_ids(project_ids: list) -> set:
+    """The subset of ``project_ids`` that are stored"""
+    def query(conn):
+        return set(conn.execute(
+            select(Project.id).where(Project.id.in_(project_ids))
+        ).scalars())
+    return get_replicas().read(query, stale=lambda found: len(found) < len(project_ids))
+
+# Default templates, seeded into the templates table
+DEFAULT_TEMPLATES = [
+    {
+        "id": "portfolio",
+        "name": "Portfolio",
+        "description": "Perfect for artists and photographers",
+        "components": ["navbar", "hero", "gallery", "about", "contact"]
+    },
+    {
+        "id": "business",
+        "name": "Business",
+        "description": "Professional business website",
+        "components": ["navbar", "hero", "services", "about", "testimonials", "contact"]
+    },
+    {
+        "id": "ecommerce",
+        "name": "E-commerce",
+        "description": "Online store template",
+        "components": ["navbar", "hero", "products", "features", "contact"]
+    },
+    {
+        "id": "restaurant",
+        "name": "Restaurant",
+        "description": "Restaurant or cafe website",
+        "components": ["navbar", "hero", "menu", "about", "reservations", "contact"]
+    },
+    {
+        "id": "custom",
+        "name": "Custom",
+        "description": "Generate from scratch based on your prompt",
+        "components": ["navbar", "hero", "gallery", "about", "services", "contact"]
+    }
+]
+
+def get_version(db, name: str) -> int:
+    """Current version of a named dataset, 0 if it was never bumped"""
+    row = db.get(RegistryVersion, name)
+    return row.version if row else 0
+
+def bump_version(db, name: str):
+    """Mark a named dataset as changed; commit together with the change itself"""
+    row = db.get(RegistryVersion, name)
+    if row is None:
+        db.add(RegistryVersion(name=name, version=1))
+    else:
+        row.version += 1
+        row.updated_at = datetime.utcnow()
+
 # Initialize default templates
 def init_templates():
     db = SessionLocal()
     try:
-        # Check if templates already exist
-        if db.query(Template).count() > 0:
+        # Only add the defaults that are missing, so new ones reach existing databases
+        existing = {template_id for (template_id,) in db.query(Template.id)}
+        missing = [data for data in DEFAULT_TEMPLATES if data["id"] not in existing]
+        if not missing:
             return
         
-        default_templates = [
-            {
-                "id": "portfolio",
-                "name": "Portfolio",
-                "description": "Perfect for artists and photographers",
-                "components": ["navbar", "hero", "gallery", "about", "contact"]
-            },
-            {
-                "id": "business",
-                "name": "Business",
-                "description": "Professional business website",
-                "components": ["navbar", "hero", "services", "about", "testimonials", "contact"]
-            },
-            {
-                "id": "ecommerce",
-                "name": "E-commerce",
-                "description": "Online store template",
-                "components": ["navbar", "hero", "products", "features", "contact"]
-            },
-            {
-                "id": "restaurant",
-                "name": "Restaurant",
-                "description": "Restaurant or cafe website",
-                "components": ["navbar", "hero", "menu", "about", "reservations", "contact"]
-            }
-        ]
-        
-        for template_data in default_templates:
+        for template_data in missing:
             template = Template(**template_data)
             db.add(template)
+        bump_version(db, "templates")
         
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker seeded the templates first
+            db.rollback()
     finally:
         db.close()
 
+_initialized = False
+_init_lock = threading.Lock()
+
+# Columns added after the first release, with the DDL that adds them
+ADDED_COLUMNS = {
+    "pinned": "ALTER TABLE projects ADD COLUMN pinned BOOLEAN NOT NULL DEFAULT {false}",
+    "pages": "ALTER TABLE projects ADD COLUMN pages {json}",
+}
+
+def add_missing_columns(engine):
+    existing = {column["name"] for column in inspect(engine).get_columns("projects")}
+    false_literal = "false" if engine.dialect.name == "postgresql" else "0"
+    json_type = JSON().compile(dialect=engine.dialect)
+    for name, ddl in ADDED_COLUMNS.items():
+        if name in existing:
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(ddl.format(false=false_literal, json=json_type)))
+        except (OperationalError, ProgrammingError):
+            pass  # another worker added it in the meantime
+
+def init_db():
+    """Create missing tables and search indexes and seed the default templates
+
+    Safe to run any number of times, including from several workers starting
+    at once; after the first successful run in a process it returns at once.
+    """
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        engine = get_engine()
+        try:
+            Base.metadata.create_all(bind=engine)
+        except OperationalError:
+            # Lost a race with another worker creating the same tables
+            Base.metadata.create_all(bind=engine)
+        # create_all skips tables that exist, so add columns and indexes
+        # introduced since
+        add_missing_columns(engine)
+        for index in Project.__table__.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except OperationalError:
+                pass  # another worker created it in the meantime
+        init_search(engine)
+        init_templates()
+        _initialized = True
+
 if __name__ == "__main__":
-    init_templates()
+    init_db()
     print("Database initialized with default templates")
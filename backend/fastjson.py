@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import threading
+
+import orjson
+from starlette.responses import Response
+
+
+class JoinedText(tuple):
+    """A string kept as parts, serialized as one JSON string without joining them"""
+
+    __slots__ = ()
+
+
+def as_text(text) -> str:
+    """``text`` as one string, joining the parts of a :class:`JoinedText`"""
+    return "".join(text) if isinstance(text, JoinedText) else text
+
+
+class JSONFragments:
+    """Serializes JSON with orjson, caching the escaped form of large strings
+
+    Generated pages repeat the same multi-kilobyte strings: every project
+    shares the stylesheet and script, and a project's html is sent again on
+    each preview and export. Pinned strings keep their escaped form forever;
+    other strings of at least ``min_length`` characters go into a byte-bounded
+    LRU keyed by object identity (the cache holds a reference, so ids are not
+    reused while an entry is alive).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, min_length: int = 4096):
+        self.max_bytes = max_bytes
+        self.min_length = min_length
+        self._pinned = {}
+        self._cache = OrderedDict()
+        self._cached_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def pin(self, text: str):
+        """Keep the escaped form of a constant string for the life of the process"""
+        self._pinned[id(text)] = (text, orjson.dumps(text))
+
+    def encode_str(self, text: str) -> bytes:
+        if len(text) < self.min_length:
+            return orjson.dumps(text)
+
+        key = id(text)
+        pinned = self._pinned.get(key)
+        if pinned is not None:
+            return pinned[1]
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] is text:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        encoded = orjson.dumps(text)
+        with self._lock:
+            self.misses += 1
+            previous = self._cache.pop(key, None)
+            if previous is not None:
+                self._cached_bytes -= len(previous[1])
+            self._cache[key] = (text, encoded)
+            self._cached_bytes += len(encoded)
+            while self._cached_bytes > self.max_bytes and self._cache:
+                _, (_, evicted) = self._cache.popitem(last=False)
+                self._cached_bytes -= len(evicted)
+        return encoded
+
+    def dumps(self, obj) -> bytes:
+        """Serialize ``obj``, splicing in cached fragments for large strings"""
+        if isinstance(obj, str):
+            return self.encode_str(obj)
+        if isinstance(obj, JoinedText):
+            # Escaping is per character, so escaped parts concatenate
+            return b'"' + b"".join(self.encode_str(part)[1:-1] for part in obj) + b'"'
+        if isinstance(obj, dict) and self._has_large_strings(obj):
+            return b"{" + b",".join(
+                orjson.dumps(key) + b":" + self.dumps(value) for key, value in obj.items()
+            ) + b"}"
+        return orjson.dumps(obj)
+
+    def _has_large_strings(self, obj: dict) -> bool:
+        for value in obj.values():
+            if isinstance(value, str):
+                if len(value) >= self.min_length:
+                    return True
+            elif isinstance(value, JoinedText):
+                return True
+            elif isinstance(value, dict) and self._has_large_strings(value):
+                return True
+        return False
+
+
+fragments = JSONFragments()
+
+
+class FastJSONResponse(Response):
+    """JSON response rendered with orjson and the shared fragment cache"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return fragments.dumps(content)
@@ -0,0 +1,360 @@
+"""Responsive images from local sources, with resized variants cached on disk
+
+Source images live in ``<root>/sources``. Each is served under a name that
+includes a hash of its content, ``/images/<name>.<hash>-<width>.<format>``,
+so the URLs of an image never change meaning and can be cached forever.
+Variants are resized and encoded on first request and kept in
+``<root>/variants``. Resizing needs Pillow; without it sources are served at
+their original size. Images with no local source fall back to a remote
+placeholder service that resizes on its side.
+
+Sources may be added by another worker sharing the directory, so the
+directory is re-scanned periodically (:meth:`ImageLibrary.watch`) and when a
+request names an image this worker does not know yet.
+"""
+from io import BytesIO
+from typing import Dict, Optional, Sequence, Tuple
+import hashlib
+import html
+import logging
+import os
+import re
+import struct
+import tempfile
+import threading
+import time
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Optional; sources are then served unresized
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+NAME = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+FILENAME = re.compile(r"^([a-z0-9][a-z0-9_-]{0,63})\.([0-9a-f]{12})(?:-(\d+))?\.(\w+)$")
+EXTENSIONS = {"jpeg": "jpg", "png": "png", "gif": "gif", "webp": "webp", "avif": "avif"}
+MEDIA_TYPES = {
+    "jpg": "image/jpeg", "png": "image/png", "gif": "image/gif",
+    "webp": "image/webp", "avif": "image/avif",
+}
+# Encoder settings per format, tuned for photographs
+SAVE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 80, "method": 4},
+    "jpeg": {"quality": 82, "optimize": True, "progressive": True},
+    "png": {"optimize": True},
+}
+
+
+def image_size(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """``(format, width, height)`` read from an image header, without decoding it"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return ("png",) + struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return ("gif",) + struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return "webp", width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return "webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return "webp", int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+        return None
+    if data[:2] == b"\xff\xd8":
+        offset = 2
+        while offset + 9 < len(data):
+            if data[offset] != 0xFF:
+                return None
+            marker = data[offset + 1]
+            if marker == 0xFF:
+                offset += 1
+                continue
+            length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+            # Start-of-frame markers, except DHT (C4), JPG (C8) and DAC (CC)
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+                return "jpeg", width, height
+            offset += 2 + length
+    return None
+
+
+def supported_formats() -> Tuple[str, ...]:
+    """Modern formats Pillow can encode here, best first"""
+    if Image is None:
+        return ()
+    formats = []
+    for name in ("avif", "webp"):
+        try:
+            if features.check(name):
+                formats.append(name)
+        except ValueError:
+            pass  # Pillow too old to know the format
+    return tuple(formats)
+
+
+class SourceImage:
+    __slots__ = ("name", "path", "format", "width", "height", "digest", "stamp")
+
+    def __init__(self, name: str, path: str, data: bytes, stamp: tuple):
+        size = image_size(data)
+        if size is None:
+            raise ValueError("unsupported image format")
+        self.name = name
+        self.path = path
+        self.format, self.width, self.height = size
+        self.digest = hashlib.sha256(data).hexdigest()[:12]
+        self.stamp = stamp
+
+    @property
+    def extension(self) -> str:
+        return EXTENSIONS[self.format]
+
+
+class RemoteImage:
+    """A placeholder served by picsum.photos, which resizes and converts by URL"""
+
+    __slots__ = ("name", "base", "width", "height")
+
+    def __init__(self, name: str, base: str, width: int, height: int):
+        self.name = name
+        self.base = base
+        self.width = width
+        self.height = height
+
+    def url(self, width: int, extension: str) -> str:
+        return f"{self.base}/{width}/{round(self.height * width / self.width)}.{extension}"
+
+
+def _attr(value) -> str:
+    return html.escape(str(value), quote=True)
+
+
+class ImageLibrary:
+    """Local source images, their cached variants and the markup that references them"""
+
+    def __init__(self, root: str, widths: Sequence[int],
+                 remote: Dict[str, Tuple[str, int, int]] = None, url_prefix: str = "/images"):
+        self.root = root
+        # Only these widths, and each source's own, are ever generated
+        self.widths = frozenset(widths)
+        self.sources_dir = os.path.join(root, "sources")
+        self.variants_dir = os.path.join(root, "variants")
+        self.url_prefix = url_prefix
+        self.remote = {name: RemoteImage(name, *spec) for name, spec in (remote or {}).items()}
+        self.formats = supported_formats()
+        self.version = 0
+        self.generated = 0
+        self._sources: Dict[str, SourceImage] = {}
+        self._markup = {}
+        self._refresh_lock = threading.Lock()
+        self._refreshed = 0.0
+        # Output path -> [lock, users]: one encoder per variant, different
+        # variants in parallel
+        self._generating: Dict[str, list] = {}
+        self._generating_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.refresh()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._sources or name in self.remote
+
+    def refresh(self) -> bool:
+        """Re-read sources whose mtime or size changed; return True if any did"""
+        with self._refresh_lock:
+            self._refreshed = time.monotonic()
+            current = self._sources
+            updated = {}
+            try:
+                entries = [entry for entry in os.scandir(self.sources_dir) if entry.is_file()]
+            except FileNotFoundError:
+                entries = []
+            for entry in entries:
+                name, _, _ = entry.name.rpartition(".")
+                if not NAME.match(name):
+                    continue
+                stat = entry.stat()
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                previous = current.get(name)
+                if previous is not None and previous.stamp == stamp and previous.path == entry.path:
+                    updated[name] = previous
+                    continue
+                try:
+                    with open(entry.path, "rb") as f:
+                        updated[name] = SourceImage(name, entry.path, f.read(), stamp)
+                except (OSError, ValueError):
+                    logger.exception("cannot read image %s", entry.path)
+            changed = updated.keys() != current.keys() or any(
+                updated[name] is not current[name] for name in updated
+            )
+            if changed:
+                self._sources = updated
+                self._markup = {}
+                self.version += 1
+            return changed
+
+    def watch(self, interval: float):
+        """Re-scan the sources every ``interval`` seconds on a daemon thread"""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._watcher = threading.Thread(target=loop, name="image-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def add(self, name: str, data: bytes) -> SourceImage:
+        """Store an uploaded source image, replacing any previous one of that name"""
+        if not NAME.match(name):
+            raise ValueError("names may only use a-z, 0-9, '-' and '_'")
+        size = image_size(data)
+        if size is None or size[0] not in ("jpeg", "png", "webp", "gif"):
+            raise ValueError("expected a JPEG, PNG, WebP or GIF image")
+        os.makedirs(self.sources_dir, exist_ok=True)
+        path = os.path.join(self.sources_dir, f"{name}.{EXTENSIONS[size[0]]}")
+        self._write_atomic(path, data)
+        for extension in set(EXTENSIONS.values()) - {EXTENSIONS[size[0]]}:
+            try:
+                os.unlink(os.path.join(self.sources_dir, f"{name}.{extension}"))
+            except FileNotFoundError:
+                pass
+        self.refresh()
+        return self._sources[name]
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                os.fchmod(f.fileno(), 0o644)
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _widths(self, source: SourceImage, wanted: Sequence[int]) -> list:
+        if Image is None:
+            return [source.width]
+        largest = min(source.width, max(wanted))
+        return sorted({width for width in wanted if width < largest} | {largest})
+
+    def _url(self, source: SourceImage, width: Optional[int], extension: str) -> str:
+        if width is None:
+            return f"{self.url_prefix}/{source.name}.{source.digest}.{source.extension}"
+        return f"{self.url_prefix}/{source.name}.{source.digest}-{width}.{extension}"
+
+    def markup(self, name: str, alt: str, widths: Sequence[int], sizes: str, eager: bool = False) -> str:
+        """An ``<img>`` (or ``<picture>``) for the image, with srcset and dimensions
+
+        Images load lazily unless ``eager``, which is meant for the one image
+        visible on first paint.
+        """
+        key = (name, alt, tuple(widths), sizes, eager)
+        cached = self._markup.get(key)
+        if cached is not None:
+            return cached
+
+        loading = 'loading="eager" fetchpriority="high"' if eager else 'loading="lazy"'
+        source = self._sources.get(name)
+        if source is not None:
+            widths = self._widths(source, widths)
+            width = widths[-1]
+            height = round(source.height * width / source.width)
+            if Image is None:
+                fallback = f'src="{self._url(source, None, source.extension)}"'
+            else:
+                fallback_extension = "png" if source.format in ("png", "gif") else "jpg"
+                fallback = 'src="%s" srcset="%s" sizes="%s"' % (
+                    self._url(source, width, fallback_extension),
+                    ", ".join(f"{self._url(source, w, fallback_extension)} {w}w" for w in widths),
+                    _attr(sizes),
+                )
+            img = (f'<img {fallback} width="{width}" height="{height}" alt="{_attr(alt)}" '
+                   f'{loading} decoding="async">')
+            if self.formats and Image is not None:
+                alternatives = "".join(
+                    '<source type="%s" srcset="%s" sizes="%s">' % (
+                        MEDIA_TYPES[fmt],
+                        ", ".join(f"{self._url(source, w, fmt)} {w}w" for w in widths),
+                        _attr(sizes),
+                    )
+                    for fmt in self.formats
+                )
+                img = f"<picture>{alternatives}{img}</picture>"
+        else:
+            remote = self.remote[name]
+            widths = sorted({w for w in widths if w <= remote.width})
+            width = widths[-1]
+            height = round(remote.height * width / remote.width)
+            srcset = ", ".join(f"{remote.url(w, 'webp')} {w}w" for w in widths)
+            img = (
+                f'<img src="{remote.url(width, "jpg")}" srcset="{srcset}" sizes="{_attr(sizes)}" '
+                f'width="{width}" height="{height}" alt="{_attr(alt)}" {loading} decoding="async">'
+            )
+        self._markup[key] = img
+        return img
+
+    def file_for(self, filename: str) -> Optional[Tuple[str, str]]:
+        """``(path, media type)`` of a source or variant file, generating it if needed"""
+        match = FILENAME.match(filename)
+        if match is None:
+            return None
+        name, digest, width, extension = match.groups()
+        source = self._sources.get(name)
+        if (source is None or source.digest != digest) and time.monotonic() - self._refreshed > 1:
+            # Possibly uploaded through another worker; re-scanning at most
+            # once a second keeps requests for unknown names cheap
+            self.refresh()
+            source = self._sources.get(name)
+        if source is None or source.digest != digest or extension not in MEDIA_TYPES:
+            return None
+        if width is None:
+            return (source.path, MEDIA_TYPES[extension]) if extension == source.extension else None
+        width = int(width)
+        if Image is None or width > source.width or (width not in self.widths and width != source.width):
+            return None
+        fmt = "jpeg" if extension == "jpg" else extension
+        if fmt not in self.formats and fmt not in ("jpeg", "png"):
+            return None
+
+        path = os.path.join(self.variants_dir, filename)
+        if not os.path.exists(path):
+            with self._generating_lock:
+                entry = self._generating.setdefault(path, [threading.Lock(), 0])
+                entry[1] += 1
+            try:
+                with entry[0]:
+                    if not os.path.exists(path):
+                        self._generate(source, width, fmt, path)
+            finally:
+                with self._generating_lock:
+                    entry[1] -= 1
+                    if not entry[1]:
+                        del self._generating[path]
+        return path, MEDIA_TYPES[extension]
+
+    def _generate(self, source: SourceImage, width: int, fmt: str, path: str):
+        with Image.open(source.path) as original:
+            image = ImageOps.exif_transpose(original)
+            if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            if width < image.width:
+                image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+        os.makedirs(self.variants_dir, exist_ok=True)
+        self._write_atomic(path, buffer.getvalue())
+        self.generated += 1
@@ -0,0 +1,154 @@
+from collections import deque
+from typing import Any, Callable, Optional
+import asyncio
+import itertools
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted to a queue that is already at capacity"""
+
+
+class Job:
+    __slots__ = (
+        "id", "priority", "payload", "status", "result", "error",
+        "enqueued_at", "started_at", "finished_at",
+    )
+
+    def __init__(self, payload: Any, priority: int = 0):
+        self.id = str(uuid.uuid4())
+        self.priority = priority
+        self.payload = payload
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.enqueued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "enqueued_at": self.enqueued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == COMPLETED:
+            data["result"] = self.result
+        elif self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+def _percentile(samples, p: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class JobQueue:
+    """Priority queue of jobs drained by a fixed pool of background workers
+
+    ``handler`` is a blocking callable that turns a job payload into a result;
+    workers run it in a thread so the event loop stays responsive. Jobs with a
+    higher priority run first, equal priorities run in submission order.
+    """
+
+    def __init__(self, handler: Callable[[Any], Any], concurrency: int = 2,
+                 max_depth: int = 1000, max_finished: int = 10000,
+                 window: int = 1000):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_depth = max_depth
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._finished = deque()
+        self._queue = None
+        self._workers = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._wait_times = deque(maxlen=window)
+        self._run_times = deque(maxlen=window)
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, payload: Any, priority: int = 0) -> Job:
+        """Enqueue a payload and return its job without waiting for it"""
+        if self._queue is None:
+            raise RuntimeError("job queue is not running")
+        if self.depth >= self.max_depth:
+            raise QueueFullError("job queue is full")
+
+        job = Job(payload, priority)
+        self._jobs[job.id] = job
+        self._queue.put_nowait((-priority, next(self._sequence), job))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.concurrency,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "running": self._running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "wait_seconds_p50": _percentile(self._wait_times, 0.50),
+            "wait_seconds_p95": _percentile(self._wait_times, 0.95),
+            "run_seconds_p50": _percentile(self._run_times, 0.50),
+            "run_seconds_p95": _percentile(self._run_times, 0.95),
+        }
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            self._running += 1
+            try:
+                job.result = await asyncio.to_thread(self.handler, job.payload)
+                job.status = COMPLETED
+                self.completed += 1
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+                self.failed += 1
+            finally:
+                job.finished_at = time.time()
+                job.payload = None
+                self._running -= 1
+                self._wait_times.append(job.started_at - job.enqueued_at)
+                self._run_times.append(job.finished_at - job.started_at)
+                self._queue.task_done()
+
+                # Forget the oldest results once too many are held
+                self._finished.append(job.id)
+                while len(self._finished) > self.max_finished:
+                    self._jobs.pop(self._finished.popleft(), None)
@@ -1,14 +1,49 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
 import os
+import hmac
+import logging
+import re
 import json
+import time
 import uuid
+import zlib
 from datetime import datetime
-
-app = FastAPI(title="AI Website Generator API", version="1.0.0")
+from functools import lru_cache
+
+from admission import AdmissionController, RateLimiter, RejectedError
+from component_library import ComponentLibrary
+from critical_css import CriticalCSS
+from fastjson import FastJSONResponse, as_text, fragments
+from images import ImageLibrary
+from jobs import JobQueue, QueueFullError
+from memory_usage import AllocationTracer, structure_sizes
+from metrics import SIZE_BUCKETS, MetricsMiddleware, Registry
+from page_weight import PageWeightAnalyzer, parse_budgets
+from profiling import ProfileStore, ProfilingMiddleware
+from project_store import ProjectRecord, ProjectStore, shared_text
+from prompt_cache import PromptCache
+from publisher import Publisher
+from static_files import IMMUTABLE, PublishedFiles
+from template_registry import TemplateRegistry
+from warmup import Warmup
+from zipstream import compression_cache, stream_zip
+import profiling
+
+logger = logging.getLogger(__name__)
+
+app = FastAPI(
+    title="AI Website Generator API",
+    version="1.0.0",
+    default_response_class=FastJSONResponse,
+)
 
 # Configure CORS
 app.add_middleware(
@@ -19,70 +54,141 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics exposed on /metrics
+metrics = Registry()
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status")
+)
+http_latency = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+)
+http_response_size = metrics.histogram(
+    "http_response_size_bytes", "HTTP response body size by route", ("route",), SIZE_BUCKETS
+)
+stage_latency = metrics.histogram(
+    "generation_stage_duration_seconds", "Time spent in each website generation stage", ("stage",)
+)
+
+app.add_middleware(
+    MetricsMiddleware,
+    requests=http_requests,
+    latency=http_latency,
+    response_size=http_response_size,
+)
+
+# On-demand request profiling, only installed when an admin token is configured
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILES_KEPT = int(os.getenv("PROFILES_KEPT", "100"))
+
+profile_store = ProfileStore(PROFILES_KEPT)
+if PROFILE_ADMIN_TOKEN:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=PROFILE_ADMIN_TOKEN,
+        store=profile_store,
+        stages={
+            "generate_website_content": ("generate_website_content",),
+            # render_components returns a lazy generator, consumed by callers
+            "build_website": ("render_components", "render_sections", "assemble_website", "build_pages"),
+            "storage": ("store_project",),
+            "serialization": ("render_response",),
+        },
+    )
+
+# Memory report on /api/admin/memory. With MEMORY_TRACE_FRAMES above 0,
+# tracemalloc records allocations from startup, keeping that many frames
+# each; this slows allocation-heavy code down by about a third
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "0"))
+
+allocation_tracer = AllocationTracer()
+if MEMORY_TRACE_FRAMES > 0:
+    allocation_tracer.start(MEMORY_TRACE_FRAMES)
+
 # Data models
 class WebsiteRequest(BaseModel):
     prompt: str
     template: Optional[str] = None
     style: Optional[str] = "modern"
+    multi_page: bool = False
+
+class JobRequest(WebsiteRequest):
+    priority: int = 0
+
+class ArchiveRequest(BaseModel):
+    ids: List[str]
 
 class WebsiteResponse(BaseModel):
     id: str
     html: str
     css: str
     js: str
+    pages: Optional[Dict[str, str]] = None
     metadata: Dict[str, Any]
 
-# In-memory storage (replace with database in production)
-projects = {}
+# In-memory storage of recent projects; every project is also written to the
+# database, which backs search and serves projects no longer held here
+projects = ProjectStore()
+PERSIST_PROJECTS = os.getenv("PERSIST_PROJECTS", "true").lower() == "true"
+SEARCH_MAX_LIMIT = 100
 
-# Component templates
-COMPONENTS = {
-    "navbar": """
-<nav class="navbar">
-    <div class="nav-container">
-        <div class="nav-logo">
-            <h1>{{company_name}}</h1>
-        </div>
-        <ul class="nav-menu">
-            <li class="nav-item"><a href="#home">Home</a></li>
-            <li class="nav-item"><a href="#about">About</a></li>
-            <li class="nav-item"><a href="#services">Services</a></li>
-            <li class="nav-item"><a href="#contact">Contact</a></li>
-        </ul>
-    </div>
-</nav>
-""",
-    "hero": """
-<section class="hero" id="home">
-    <div class="hero-content">
-        <h1>{{headline}}</h1>
-        <p>{{subheadline}}</p>
-        <button class="cta-button">{{cta_text}}</button>
-    </div>
-</section>
-""",
-    "about": """
-<section class="about" id="about">
-    <div class="container">
-        <h2>About Us</h2>
-        <p>{{about_text}}</p>
-    </div>
-</section>
-""",
-    "contact": """
-<section class="contact" id="contact">
-    <div class="container">
-        <h2>Contact Us</h2>
-        <form class="contact-form">
-            <input type="text" placeholder="Name" required>
-            <input type="email" placeholder="Email" required>
-            <textarea placeholder="Message" required></textarea>
-            <button type="submit">Send Message</button>
-        </form>
-    </div>
-</section>
-"""
-}
+# Near-duplicate prompt cache: similar prompts reuse an earlier generation
+PROMPT_CACHE_THRESHOLD = float(os.getenv("PROMPT_CACHE_THRESHOLD", "0.7"))
+PROMPT_CACHE_SIZE = int(os.getenv("PROMPT_CACHE_SIZE", "10000"))
+
+prompt_cache = PromptCache(threshold=PROMPT_CACHE_THRESHOLD, max_entries=PROMPT_CACHE_SIZE)
+
+# Component library: components/*.html, compiled once and reloaded when edited
+COMPONENTS_DIR = os.getenv(
+    "COMPONENTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "components")
+)
+COMPONENT_WATCH_INTERVAL = float(os.getenv("COMPONENT_WATCH_INTERVAL", "1"))
+
+components = ComponentLibrary(os.path.normpath(COMPONENTS_DIR))
+
+# Published sites, served as static files from PUBLISH_DIR/sites under /sites
+PUBLISH_DIR = os.getenv("PUBLISH_DIR", "./published")
+
+publisher = Publisher(PUBLISH_DIR)
+app.mount("/sites", PublishedFiles(directory=publisher.sites_dir, html=True, check_dir=False), name="sites")
+
+# Images: sources in IMAGE_DIR/sources, resized variants cached beside them.
+# Until a local source is added, each image is a remote placeholder
+IMAGE_DIR = os.getenv("IMAGE_DIR", "./images")
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(20 * 1024 * 1024)))
+# Seconds between scans for sources uploaded through other workers (0 disables)
+IMAGE_WATCH_INTERVAL = float(os.getenv("IMAGE_WATCH_INTERVAL", "5"))
+HERO_WIDTHS = (640, 960, 1280, 1920)
+HERO_SIZES = "100vw"
+GALLERY_WIDTHS = (400, 800)
+# One column on phones, otherwise up to three in a 1200px grid
+GALLERY_SIZES = "(max-width: 768px) 100vw, 400px"
+
+images = ImageLibrary(
+    IMAGE_DIR,
+    HERO_WIDTHS + GALLERY_WIDTHS,
+    remote={
+        **{f"hero{i}": (f"https://picsum.photos/seed/hero{i}", 1920, 1080) for i in (1, 2, 3)},
+        **{
+            f"{category}{i}": (f"https://picsum.photos/seed/{category}{i}", 800, 600)
+            for category in ("travel", "nature", "street", "aerial") for i in (1, 2)
+        },
+        **{f"gallery{i}": (f"https://picsum.photos/seed/gallery{i}", 800, 600) for i in range(1, 7)},
+    },
+)
+
+def gallery_image(name: str, alt: str) -> str:
+    return images.markup(name, alt, GALLERY_WIDTHS, GALLERY_SIZES)
+
+def hero_images() -> dict:
+    """Slide images for the hero slider; only the first, shown at load, is fetched eagerly"""
+    return {
+        f"hero_image_{i}": images.markup(f"hero{i}", f"Hero Image {i}", HERO_WIDTHS, HERO_SIZES, eager=i == 1)
+        for i in (1, 2, 3)
+    }
+
+def gallery_images() -> dict:
+    """Images of the gallery.html library component"""
+    return {f"gallery_image_{i}": gallery_image(f"gallery{i}", f"Gallery Image {i}") for i in range(1, 7)}
 
 # Base CSS styles
 BASE_CSS = """
@@ -300,300 +406,8 @@ body {
 }
 """
 
-def generate_website_content(prompt: str, template: str = None) -> dict:
-    """Generate website content based on prompt using AI-like logic"""
-    
-    # Analyze prompt for specific requirements
-    prompt_lower = prompt.lower()
-    
-    # Base content
-    content = {
-        "company_name": "Your Company",
-        "headline": "Welcome to Our Website",
-        "subheadline": "We create amazing digital experiences",
-        "cta_text": "Get Started",
-        "about_text": "We are a passionate team dedicated to delivering excellence in everything we do."
-    }
-    
-    # Detailed photography portfolio analysis
-    if "photography" in prompt_lower and "portfolio" in prompt_lower:
-        content.update({
-            "company_name": "Photography Portfolio",
-            "headline": "Capturing Life's Beautiful Moments",
-            "subheadline": "Award-winning photography from around the world",
-            "cta_text": "View Portfolio",
-            "about_text": "With over 10 years of experience, I specialize in capturing the essence of our world through my lens. From breathtaking landscapes to intimate street moments, every photograph tells a unique story.",
-            "gallery_categories": "Travel, Nature, Street, Aerial",
-            "services_title": "Photography Services",
-            "services_text": "Professional photography services for weddings, events, commercial projects, and fine art commissions."
-        })
-        
-        # Add specific sections based on prompt requirements
-        if "travel" in prompt_lower:
-            content["travel_section"] = """
-<section class="travel-gallery">
-    <div class="container">
-        <h2>Travel Photography</h2>
-        <p>Journey through captivating destinations around the globe</p>
-        <div class="gallery-grid">
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/travel1/400/300.jpg" alt="Travel Photography">
-                <div class="gallery-overlay">
-                    <h3>Sunset at Santorini</h3>
-                    <p>Greece, 2024</p>
-                </div>
-            </div>
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/travel2/400/300.jpg" alt="Travel Photography">
-                <div class="gallery-overlay">
-                    <h3>Morning Mist in Kyoto</h3>
-                    <p>Japan, 2024</p>
-                </div>
-            </div>
-        </div>
-    </div>
-</section>
-"""
-        
-        if "nature" in prompt_lower:
-            content["nature_section"] = """
-<section class="nature-gallery">
-    <div class="container">
-        <h2>Nature Photography</h2>
-        <p>Exploring the beauty of the natural world</p>
-        <div class="gallery-grid">
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/nature1/400/300.jpg" alt="Nature Photography">
-                <div class="gallery-overlay">
-                    <h3>Mountain Sunrise</h3>
-                    <p>Swiss Alps, 2024</p>
-                </div>
-            </div>
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/nature2/400/300.jpg" alt="Nature Photography">
-                <div class="gallery-overlay">
-                    <h3>Forest Path</h3>
-                    <p>Black Forest, Germany</p>
-                </div>
-            </div>
-        </div>
-    </div>
-</section>
-"""
-        
-        if "street" in prompt_lower:
-            content["street_section"] = """
-<section class="street-gallery">
-    <div class="container">
-        <h2>Street Photography</h2>
-        <p>Capturing life as it happens in urban environments</p>
-        <div class="gallery-grid">
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/street1/400/300.jpg" alt="Street Photography">
-                <div class="gallery-overlay">
-                    <h3>Rush Hour</h3>
-                    <p>Tokyo, Japan</p>
-                </div>
-            </div>
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/street2/400/300.jpg" alt="Street Photography">
-                <div class="gallery-overlay">
-                    <h3>Cafe Life</h3>
-                    <p>Paris, France</p>
-                </div>
-            </div>
-        </div>
-    </div>
-</section>
-"""
-        
-        if "aerial" in prompt_lower:
-            content["aerial_section"] = """
-<section class="aerial-gallery">
-    <div class="container">
-        <h2>Aerial Photography</h2>
-        <p>Seeing the world from a different perspective</p>
-        <div class="gallery-grid">
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/aerial1/400/300.jpg" alt="Aerial Photography">
-                <div class="gallery-overlay">
-                    <h3>Coastal Patterns</h3>
-                    <p>California Coast</p>
-                </div>
-            </div>
-            <div class="gallery-item">
-                <img src="https://picsum.photos/seed/aerial2/400/300.jpg" alt="Aerial Photography">
-                <div class="gallery-overlay">
-                    <h3>City Lights</h3>
-                    <p>New York City</p>
-                </div>
-            </div>
-        </div>
-    </div>
-</section>
-"""
-    
-    # E-commerce with jewelry
-    elif "ecommerce" in prompt_lower and "jewelry" in prompt_lower:
-        content.update({
-            "company_name": "Artisan Jewelry Collection",
-            "headline": "Handcrafted Elegance",
-            "subheadline": "Unique pieces made with love and precious materials",
-            "cta_text": "Shop Collection",
-            "about_text": "We create unique, handcrafted jewelry pieces that tell your story and complement your style. Each piece is carefully crafted using traditional techniques and modern design.",
-            "products_title": "Featured Collections",
-            "products_text": "Discover our curated selection of rings, necklaces, earrings, and bracelets."
-        })
-    
-    # Restaurant/Cafe
-    elif "restaurant" in prompt_lower or "cafe" in prompt_lower:
-        content.update({
-            "company_name": "Gourmet Restaurant",
-            "headline": "Exceptional Dining Experience",
-            "subheadline": "Fresh ingredients, innovative cuisine, memorable moments",
-            "cta_text": "Reserve Table",
-            "about_text": "We bring you the finest culinary experience with fresh, locally-sourced ingredients and innovative recipes that celebrate both tradition and creativity.",
-            "menu_title": "Our Menu",
-            "menu_text": "Seasonal dishes crafted with passion and precision"
-        })
-    
-    # Business/Corporate
-    elif "business" in prompt_lower or "corporate" in prompt_lower:
-        content.update({
-            "company_name": "Business Solutions",
-            "headline": "Innovative Business Solutions",
-            "subheadline": "Driving success through technology and expertise",
-            "cta_text": "Learn More",
-            "about_text": "We provide cutting-edge business solutions that help companies thrive in the digital age. Our team of experts delivers results that matter.",
-            "services_title": "Our Services",
-            "services_text": "Comprehensive solutions for modern businesses"
-        })
-    
-    # Modern design requirements
-    if "modern" in prompt_lower or "minimal" in prompt_lower:
-        content["design_style"] = "modern"
-        content["color_scheme"] = "minimal"
-    
-    if "responsive" in prompt_lower:
-        content["responsive"] = True
-    
-    if "seo" in prompt_lower:
-        content["seo_optimized"] = True
-    
-    return content
-
-def build_website(content: dict, template: str = None) -> dict:
-    """Build complete website from content and components"""
-    
-    # Build HTML
-    html_components = []
-    
-    # Add navbar
-    navbar_html = COMPONENTS["navbar"]
-    for key, value in content.items():
-        if isinstance(value, str):
-            navbar_html = navbar_html.replace(f"{{{{{key}}}}}", value)
-    html_components.append(navbar_html)
-    
-    # Add enhanced hero section for photography
-    if "photography" in content.get("company_name", "").lower():
-        hero_html = """
-<section class="hero" id="home">
-    <div class="hero-slider">
-        <div class="hero-slide active">
-            <img src="https://picsum.photos/seed/hero1/1920/1080.jpg" alt="Hero Image 1">
-            <div class="hero-content">
-                <h1>{headline}</h1>
-                <p>{subheadline}</p>
-                <button class="cta-button">{cta_text}</button>
-            </div>
-        </div>
-        <div class="hero-slide">
-            <img src="https://picsum.photos/seed/hero2/1920/1080.jpg" alt="Hero Image 2">
-            <div class="hero-content">
-                <h1>{headline}</h1>
-                <p>{subheadline}</p>
-                <button class="cta-button">{cta_text}</button>
-            </div>
-        </div>
-        <div class="hero-slide">
-            <img src="https://picsum.photos/seed/hero3/1920/1080.jpg" alt="Hero Image 3">
-            <div class="hero-content">
-                <h1>{headline}</h1>
-                <p>{subheadline}</p>
-                <button class="cta-button">{cta_text}</button>
-            </div>
-        </div>
-    </div>
-    <div class="slider-controls">
-        <button class="slider-btn prev">‹</button>
-        <button class="slider-btn next">›</button>
-    </div>
-</section>
-"""
-    else:
-        hero_html = COMPONENTS["hero"]
-    
-    for key, value in content.items():
-        if isinstance(value, str):
-            hero_html = hero_html.replace(f"{{{{{key}}}}}", value)
-    html_components.append(hero_html)
-    
-    # Add category sections for photography
-    if content.get("travel_section"):
-        html_components.append(content["travel_section"])
-    
-    if content.get("nature_section"):
-        html_components.append(content["nature_section"])
-    
-    if content.get("street_section"):
-        html_components.append(content["street_section"])
-    
-    if content.get("aerial_section"):
-        html_components.append(content["aerial_section"])
-    
-    # Add about section
-    about_html = COMPONENTS["about"]
-    for key, value in content.items():
-        if isinstance(value, str):
-            about_html = about_html.replace(f"{{{{{key}}}}}", value)
-    html_components.append(about_html)
-    
-    # Add services section if available
-    if content.get("services_title"):
-        services_html = f"""
-<section class="services" id="services">
-    <div class="container">
-        <h2>{content.get('services_title', 'Our Services')}</h2>
-        <p>{content.get('services_text', 'Professional services tailored to your needs')}</p>
-        <div class="services-grid">
-            <div class="service-card">
-                <h3>Wedding Photography</h3>
-                <p>Capturing your special day with artistic vision and attention to detail.</p>
-            </div>
-            <div class="service-card">
-                <h3>Event Coverage</h3>
-                <p>Professional documentation of corporate events, parties, and celebrations.</p>
-            </div>
-            <div class="service-card">
-                <h3>Commercial Projects</h3>
-                <p>High-quality imagery for brands, products, and marketing campaigns.</p>
-            </div>
-        </div>
-    </div>
-</section>
-"""
-        html_components.append(services_html)
-    
-    # Add contact section
-    contact_html = COMPONENTS["contact"]
-    for key, value in content.items():
-        if isinstance(value, str):
-            contact_html = contact_html.replace(f"{{{{{key}}}}}", value)
-    html_components.append(contact_html)
-    
-    # Enhanced CSS with animations and modern design
-    enhanced_css = BASE_CSS + """
+# Enhanced CSS with animations and modern design
+ENHANCED_CSS = BASE_CSS + """
 /* Enhanced Hero Section with Slider */
 .hero {
     position: relative;
@@ -618,6 +432,11 @@ def build_website(content: dict, template: str = None) -> dict:
     opacity: 1;
 }
 
+/* Responsive images may be wrapped in <picture>; lay out the <img> as if it were not */
+picture {
+    display: contents;
+}
+
 .hero-slide img {
     width: 100%;
     height: 100%;
@@ -881,9 +700,9 @@ def build_website(content: dict, template: str = None) -> dict:
     }
 }
 """
-    
-    # Enhanced JavaScript
-    enhanced_js = """
+
+# Enhanced JavaScript
+ENHANCED_JS = """
 // Hero Slider
 let currentSlide = 0;
 const slides = document.querySelectorAll('.hero-slide');
@@ -982,132 +801,1234 @@ document.querySelector('.cta-button')?.addEventListener('click', function() {
     }
 });
 """
+
+# Every generated site shares these blocks; keep their JSON-escaped form around
+fragments.pin(ENHANCED_CSS)
+fragments.pin(ENHANCED_JS)
+# and let stored projects keep a single copy of them
+shared_text.pin(ENHANCED_CSS)
+shared_text.pin(ENHANCED_JS)
+
+# Every keyword generate_website_content branches on
+PROMPT_KEYWORDS = (
+    "photography", "portfolio", "travel", "nature", "street", "aerial",
+    "ecommerce", "jewelry", "restaurant", "cafe", "business", "corporate",
+    "modern", "minimal", "responsive", "seo",
+)
+
+def prompt_features(prompt: str) -> frozenset:
+    """Keywords found in a prompt; equal features produce equal content"""
+    prompt_lower = prompt.lower()
+    return frozenset(keyword for keyword in PROMPT_KEYWORDS if keyword in prompt_lower)
+
+def generate_website_content(prompt: str, template: str = None) -> dict:
+    """Generate website content based on prompt using AI-like logic"""
     
-    # Combine all HTML
-    full_html = f"""
+    # Analyze prompt for specific requirements
+    prompt_lower = prompt.lower()
+    
+    # Base content
+    content = {
+        "company_name": "Your Company",
+        "headline": "Welcome to Our Website",
+        "subheadline": "We create amazing digital experiences",
+        "cta_text": "Get Started",
+        "about_text": "We are a passionate team dedicated to delivering excellence in everything we do."
+    }
+    
+    # Detailed photography portfolio analysis
+    if "photography" in prompt_lower and "portfolio" in prompt_lower:
+        content.update({
+            "company_name": "Photography Portfolio",
+            "headline": "Capturing Life's Beautiful Moments",
+            "subheadline": "Award-winning photography from around the world",
+            "cta_text": "View Portfolio",
+            "about_text": "With over 10 years of experience, I specialize in capturing the essence of our world through my lens. From breathtaking landscapes to intimate street moments, every photograph tells a unique story.",
+            "gallery_categories": "Travel, Nature, Street, Aerial",
+            "services_title": "Photography Services",
+            "services_text": "Professional photography services for weddings, events, commercial projects, and fine art commissions."
+        })
+        
+        # Add specific sections based on prompt requirements
+        if "travel" in prompt_lower:
+            content["travel_section"] = f"""
+<section class="travel-gallery">
+    <div class="container">
+        <h2>Travel Photography</h2>
+        <p>Journey through captivating destinations around the globe</p>
+        <div class="gallery-grid">
+            <div class="gallery-item">
+                {gallery_image("travel1", "Travel Photography")}
+                <div class="gallery-overlay">
+                    <h3>Sunset at Santorini</h3>
+                    <p>Greece, 2024</p>
+                </div>
+            </div>
+            <div class="gallery-item">
+                {gallery_image("travel2", "Travel Photography")}
+                <div class="gallery-overlay">
+                    <h3>Morning Mist in Kyoto</h3>
+                    <p>Japan, 2024</p>
+                </div>
+            </div>
+        </div>
+    </div>
+</section>
+"""
+        
+        if "nature" in prompt_lower:
+            content["nature_section"] = f"""
+<section class="nature-gallery">
+    <div class="container">
+        <h2>Nature Photography</h2>
+        <p>Exploring the beauty of the natural world</p>
+        <div class="gallery-grid">
+            <div class="gallery-item">
+                {gallery_image("nature1", "Nature Photography")}
+                <div class="gallery-overlay">
+                    <h3>Mountain Sunrise</h3>
+                    <p>Swiss Alps, 2024</p>
+                </div>
+            </div>
+            <div class="gallery-item">
+                {gallery_image("nature2", "Nature Photography")}
+                <div class="gallery-overlay">
+                    <h3>Forest Path</h3>
+                    <p>Black Forest, Germany</p>
+                </div>
+            </div>
+        </div>
+    </div>
+</section>
+"""
+        
+        if "street" in prompt_lower:
+            content["street_section"] = f"""
+<section class="street-gallery">
+    <div class="container">
+        <h2>Street Photography</h2>
+        <p>Capturing life as it happens in urban environments</p>
+        <div class="gallery-grid">
+            <div class="gallery-item">
+                {gallery_image("street1", "Street Photography")}
+                <div class="gallery-overlay">
+                    <h3>Rush Hour</h3>
+                    <p>Tokyo, Japan</p>
+                </div>
+            </div>
+            <div class="gallery-item">
+                {gallery_image("street2", "Street Photography")}
+                <div class="gallery-overlay">
+                    <h3>Cafe Life</h3>
+                    <p>Paris, France</p>
+                </div>
+            </div>
+        </div>
+    </div>
+</section>
+"""
+        
+        if "aerial" in prompt_lower:
+            content["aerial_section"] = f"""
+<section class="aerial-gallery">
+    <div class="container">
+        <h2>Aerial Photography</h2>
+        <p>Seeing the world from a different perspective</p>
+        <div class="gallery-grid">
+            <div class="gallery-item">
+                {gallery_image("aerial1", "Aerial Photography")}
+                <div class="gallery-overlay">
+                    <h3>Coastal Patterns</h3>
+                    <p>California Coast</p>
+                </div>
+            </div>
+            <div class="gallery-item">
+                {gallery_image("aerial2", "Aerial Photography")}
+                <div class="gallery-overlay">
+                    <h3>City Lights</h3>
+                    <p>New York City</p>
+                </div>
+            </div>
+        </div>
+    </div>
+</section>
+"""
+    
+    # E-commerce with jewelry
+    elif "ecommerce" in prompt_lower and "jewelry" in prompt_lower:
+        content.update({
+            "company_name": "Artisan Jewelry Collection",
+            "headline": "Handcrafted Elegance",
+            "subheadline": "Unique pieces made with love and precious materials",
+            "cta_text": "Shop Collection",
+            "about_text": "We create unique, handcrafted jewelry pieces that tell your story and complement your style. Each piece is carefully crafted using traditional techniques and modern design.",
+            "products_title": "Featured Collections",
+            "products_text": "Discover our curated selection of rings, necklaces, earrings, and bracelets."
+        })
+    
+    # Restaurant/Cafe
+    elif "restaurant" in prompt_lower or "cafe" in prompt_lower:
+        content.update({
+            "company_name": "Gourmet Restaurant",
+            "headline": "Exceptional Dining Experience",
+            "subheadline": "Fresh ingredients, innovative cuisine, memorable moments",
+            "cta_text": "Reserve Table",
+            "about_text": "We bring you the finest culinary experience with fresh, locally-sourced ingredients and innovative recipes that celebrate both tradition and creativity.",
+            "menu_title": "Our Menu",
+            "menu_text": "Seasonal dishes crafted with passion and precision"
+        })
+    
+    # Business/Corporate
+    elif "business" in prompt_lower or "corporate" in prompt_lower:
+        content.update({
+            "company_name": "Business Solutions",
+            "headline": "Innovative Business Solutions",
+            "subheadline": "Driving success through technology and expertise",
+            "cta_text": "Learn More",
+            "about_text": "We provide cutting-edge business solutions that help companies thrive in the digital age. Our team of experts delivers results that matter.",
+            "services_title": "Our Services",
+            "services_text": "Comprehensive solutions for modern businesses"
+        })
+    
+    # Modern design requirements
+    if "modern" in prompt_lower or "minimal" in prompt_lower:
+        content["design_style"] = "modern"
+        content["color_scheme"] = "minimal"
+    
+    if "responsive" in prompt_lower:
+        content["responsive"] = True
+    
+    if "seo" in prompt_lower:
+        content["seo_optimized"] = True
+    
+    return content
+
+def render_navbar(content: dict):
+    yield "navbar", components["navbar"].render(content)
+
+def render_hero(content: dict):
+    # Slider hero for photography
+    if "photography" in content.get("company_name", "").lower():
+        yield "hero", components["hero-slider"].render({**content, **hero_images()})
+    else:
+        yield "hero", components["hero"].render(content)
+
+def render_gallery(content: dict):
+    # Category sections for photography
+    for section in ("travel_section", "nature_section", "street_section", "aerial_section"):
+        if content.get(section):
+            yield section, content[section]
+
+def render_about(content: dict):
+    yield "about", components["about"].render(content)
+
+def render_services(content: dict):
+    if content.get("services_title"):
+        defaults = {"services_text": "Professional services tailored to your needs"}
+        yield "services", components["photography-services"].render({**defaults, **content})
+
+def render_contact(content: dict):
+    yield "contact", components["contact"].render(content)
+
+# Template component name -> renderer yielding (name, html) pairs
+COMPONENT_RENDERERS = {
+    "navbar": render_navbar,
+    "hero": render_hero,
+    "gallery": render_gallery,
+    "about": render_about,
+    "services": render_services,
+    "contact": render_contact,
+}
+
+# Responsive images filling the placeholders of library components
+LIBRARY_IMAGES = {
+    "gallery": gallery_images,
+}
+
+# Used when no template is given or the template is unknown
+DEFAULT_COMPONENTS = ("navbar", "hero", "gallery", "about", "services", "contact")
+
+# Templates from the database, reloaded when another worker changes them
+TEMPLATE_REFRESH_INTERVAL = float(os.getenv("TEMPLATE_REFRESH_INTERVAL", "5"))
+
+template_registry = TemplateRegistry(TEMPLATE_REFRESH_INTERVAL)
+
+# (template, component) pairs already warned about
+_unknown_components = set()
+
+def template_components(template: str = None) -> tuple:
+    """Component names a template renders, in page order
+
+    A template naming a component that has neither a renderer nor a library
+    file would lose that section, so it renders the default sections instead.
+    """
+    if not template:
+        return DEFAULT_COMPONENTS
+    entry = template_registry.get(template)
+    if not entry:
+        return DEFAULT_COMPONENTS
+    unknown = [name for name in entry["components"] if name not in COMPONENT_RENDERERS and name not in components]
+    if unknown:
+        for name in unknown:
+            if (template, name) not in _unknown_components:
+                _unknown_components.add((template, name))
+                logger.warning("template %s: no renderer or components/%s.html, using the default sections", template, name)
+        return DEFAULT_COMPONENTS
+    return entry["components"]
+
+def render_components(content: dict, template: str = None):
+    """Render the template's page sections in order, yielding (name, html) pairs
+
+    A component a template asks for that has no renderer, or whose renderer
+    has nothing to show for this content, is rendered from the library file
+    of the same name when there is one (gallery.html, services.html, ...).
+    The default sequence keeps sections such as services optional.
+    """
+    names = template_components(template)
+    return render_sections(content, names, names is not DEFAULT_COMPONENTS)
+
+def render_sections(content: dict, names: tuple, explicit: bool):
+    for name in names:
+        renderer = COMPONENT_RENDERERS.get(name)
+        rendered = False
+        if renderer is not None:
+            for section in renderer(content):
+                rendered = True
+                yield section
+        if not rendered and explicit and name in components:
+            library_images = LIBRARY_IMAGES.get(name)
+            yield name, components[name].render({**content, **library_images()} if library_images else content)
+
+# Critical CSS: inline only the rules the navbar and hero need and load the
+# full stylesheet without blocking rendering. The stylesheet is fetched from
+# CRITICAL_CSS_HREF, relative to the page, so this only applies to published
+# and exported sites, which ship style.css next to index.html. The page the
+# editor shows in an iframe cannot load it, so it keeps the full stylesheet
+# inline after the critical rules, and exports swap that for the link
+CRITICAL_CSS = os.getenv("CRITICAL_CSS", "false").lower() == "true"
+CRITICAL_CSS_HREF = os.getenv("CRITICAL_CSS_HREF", "style.css")
+ABOVE_THE_FOLD = ("navbar", "hero")
+
+critical_css = CriticalCSS(ENHANCED_CSS) if CRITICAL_CSS else None
+
+DEFERRED_STYLES = f"""    <style data-deferred>
+{ENHANCED_CSS}
+    </style>"""
+
+def deferred_styles(href: str) -> str:
+    return f"""    <link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel='stylesheet'">
+    <noscript><link rel="stylesheet" href="{href}"></noscript>"""
+
+def head_styles(above_fold: str, href: str = None) -> str:
+    """The stylesheet markup for <head>; ``href`` links an external stylesheet"""
+    if critical_css is None:
+        if href:
+            return f'    <link rel="stylesheet" href="{href}">'
+        return f"""    <style>
+{ENHANCED_CSS}
+    </style>"""
+    return f"""    <style>{critical_css.for_html(above_fold)}</style>
+{deferred_styles(href) if href else DEFERRED_STYLES}"""
+
+@lru_cache(maxsize=256)
+def exported_page(html) -> str:
+    """A single page as exported: with critical CSS on, the stylesheet inlined
+    for the editor is swapped for a non-blocking link
+
+    Cached by value, so exporting a page again returns the same string and
+    the ZIP compression cache recognizes it.
+    """
+    html = as_text(html)
+    if critical_css is None:
+        return html
+    return html.replace(DEFERRED_STYLES, deferred_styles(CRITICAL_CSS_HREF), 1)
+
+def body_script(src: str = None) -> str:
+    if src:
+        return f'    <script src="{src}" defer></script>'
+    return f"""    <script>
+{ENHANCED_JS}
+    </script>"""
+
+def assemble_website(content: dict, html_components: list, above_fold: str = "",
+                     title: str = None, bundle: bool = False) -> dict:
+    """Combine rendered sections, CSS and JavaScript into a complete page
+
+    ``above_fold`` is the markup visible on first paint, whose styles are
+    inlined when critical CSS is on. With ``bundle`` the page links the
+    shared stylesheet and script instead of inlining them.
+    """
+    
+    # Combine all HTML
+    full_html = f"""
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{content.get('company_name', 'Website')}</title>
+    <title>{title or content.get('company_name', 'Website')}</title>
     <meta name="description" content="{content.get('subheadline', 'Professional website')}">
     <meta name="keywords" content="photography, portfolio, professional, {content.get('gallery_categories', '')}">
-    <style>
-{enhanced_css}
-    </style>
+{head_styles(above_fold, BUNDLE_CSS if bundle else None)}
 </head>
 <body>
 {''.join(html_components)}
-    <script>
-{enhanced_js}
-    </script>
+{body_script(BUNDLE_JS if bundle else None)}
 </body>
 </html>
 """
     
     return {
         "html": full_html,
-        "css": enhanced_css,
-        "js": enhanced_js
+        "css": ENHANCED_CSS,
+        "js": ENHANCED_JS
+    }
+
+def build_website(content: dict, template: str = None) -> dict:
+    """Build complete website from content and components"""
+    sections = list(render_components(content, template))
+    above_fold = "".join(html for name, html in sections if name in ABOVE_THE_FOLD)
+    return assemble_website(content, [html for _, html in sections], above_fold)
+
+# Multi-page sites: one page per part of the single-page layout, all linking
+# one stylesheet and one script whose names carry a hash of their content,
+# so browsers download them once and can cache them forever.
+# Pages are rendered concurrently on PAGE_RENDER_WORKERS threads. The built-in
+# components render in microseconds under the GIL, where threads only add
+# overhead (290us instead of 170us for five pages), so this is off by default;
+# it pays off for slow custom components or a free-threaded Python
+PAGE_RENDER_WORKERS = int(os.getenv("PAGE_RENDER_WORKERS", "0"))
+# (anchor, file, title, components); components in no page go on the home page
+SITE_PAGES = (
+    ("home", "index.html", "Home", ("hero",)),
+    ("gallery", "gallery.html", "Gallery", ("gallery",)),
+    ("about", "about.html", "About", ("about",)),
+    ("services", "services.html", "Services", ("services",)),
+    ("contact", "contact.html", "Contact", ("contact",)),
+)
+PAGE_OF_COMPONENT = {name: page for _, page, _, names in SITE_PAGES for name in names}
+PAGE_ANCHORS = frozenset(anchor for anchor, _, _, _ in SITE_PAGES)
+PAGE_LINK = re.compile(r'href="#([\w-]+)"')
+NAV_ITEM = re.compile(r'(\s*<li class="nav-item"><a href="#([\w-]+)"[^>]*>.*?</a></li>)', re.S)
+NAV_MENU_END = "</ul>"
+
+def bundle_path(stem: str, extension: str, text: str) -> str:
+    return f"assets/{stem}.{hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]}.{extension}"
+
+BUNDLE_CSS = bundle_path("style", "css", ENHANCED_CSS)
+BUNDLE_JS = bundle_path("script", "js", ENHANCED_JS)
+
+page_renderer = (
+    ThreadPoolExecutor(PAGE_RENDER_WORKERS, thread_name_prefix="page-render") if PAGE_RENDER_WORKERS > 0 else None
+)
+
+def link_pages(html: str, files: dict, current: str) -> str:
+    """Point in-page anchors at the page holding that section"""
+    def replace(match):
+        page = files.get(match.group(1))
+        if page is None:
+            return match.group(0)
+        return f'href="{page}" aria-current="page"' if page == current else f'href="{page}"'
+    return PAGE_LINK.sub(replace, html)
+
+def nav_links(navbar: str, files: dict, titles: dict) -> str:
+    """The navbar with one menu item per page of the site, in site order
+
+    Items for pages the site does not have are dropped; items for other
+    anchors are kept after the pages.
+    """
+    others = [item for item in NAV_ITEM.findall(navbar) if item[1] not in PAGE_ANCHORS]
+    first = NAV_ITEM.search(navbar)
+    position = first.start() if first else navbar.rfind(NAV_MENU_END)
+    if position < 0:
+        return navbar
+    items = [
+        f'\n            <li class="nav-item"><a href="#{anchor}">{titles[anchor]}</a></li>' for anchor in files
+    ] + [item for item, _ in others]
+    if first is None:
+        items.append("\n        ")
+    navbar = NAV_ITEM.sub("", navbar)
+    return f"{navbar[:position]}{''.join(items)}{navbar[position:]}"
+
+def build_pages(content: dict, template: str = None) -> dict:
+    """Build a multi-page site: the home page as a standalone ``html`` and
+    every page, linking the shared bundle, in ``pages``
+
+    Each page's sections are rendered on the page render pool, if there is
+    one. Pages left without content are dropped, apart from the home page.
+    """
+    names = template_components(template)
+    explicit = names is not DEFAULT_COMPONENTS
+    plan = {page: [] for _, page, _, _ in SITE_PAGES}
+    for name in names:
+        if name != "navbar":
+            plan[PAGE_OF_COMPONENT.get(name, "index.html")].append(name)
+    navbar = ("navbar",) if "navbar" in names else ()
+    rendered = dict(zip(plan, (page_renderer.map if page_renderer else map)(
+        lambda page_names: list(render_sections(content, navbar + tuple(page_names), explicit)),
+        plan.values(),
+    )))
+
+    files = {}
+    titles = {}
+    for anchor, page, title, _ in SITE_PAGES:
+        if page == "index.html" or any(name != "navbar" for name, _ in rendered[page]):
+            files[anchor] = page
+            titles[anchor] = title
+    company = content.get("company_name", "Website")
+    pages = {}
+    home = None
+    for anchor, page in files.items():
+        sections = [
+            (name, nav_links(html, files, titles) if name == "navbar" else html)
+            for name, html in rendered[page]
+        ]
+        if page == "index.html":
+            above_fold = "".join(html for name, html in sections if name in ABOVE_THE_FOLD)
+        else:
+            # The navbar and the page's first section
+            above_fold = "".join(html for _, html in sections[:len(navbar) + 1])
+        body = [link_pages(html, files, page) for _, html in sections]
+        title = company if page == "index.html" else f"{titles[anchor]} | {company}"
+        pages[page] = assemble_website(content, body, above_fold, title, bundle=True)["html"]
+        if page == "index.html":
+            home = assemble_website(content, body, above_fold)
+    return {**home, "pages": pages}
+
+# Page weight: bytes, elements, images, render-blocking resources and script
+# timers of every generated page, checked against PAGE_BUDGETS
+# ("page_gzip_bytes=40000,dom_nodes=800", on top of the defaults)
+PAGE_WEIGHT_ANALYSIS = os.getenv("PAGE_WEIGHT_ANALYSIS", "true").lower() == "true"
+PAGE_BUDGETS = os.getenv("PAGE_BUDGETS", "")
+
+page_weight = PageWeightAnalyzer(parse_budgets(PAGE_BUDGETS))
+page_budget_warnings = metrics.counter(
+    "page_budget_warnings_total", "Generated pages over a performance budget, by metric", ("metric",)
+)
+
+def analyze_page_weight(website: dict) -> Optional[dict]:
+    if not PAGE_WEIGHT_ANALYSIS:
+        return None
+    report = page_weight.analyze(website)
+    for warning in report["warnings"]:
+        page_budget_warnings.inc(warning["metric"])
+    return report
+
+# Background generation queue for POST /api/jobs
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+JOB_RESULTS_KEPT = int(os.getenv("JOB_RESULTS_KEPT", "10000"))
+
+job_queue = JobQueue(
+    lambda request: create_website(request),
+    concurrency=JOB_WORKERS,
+    max_depth=JOB_QUEUE_SIZE,
+    max_finished=JOB_RESULTS_KEPT,
+)
+
+# Admission control for the generation endpoints
+GENERATE_MAX_IN_FLIGHT = int(os.getenv("GENERATE_MAX_IN_FLIGHT", "4"))
+GENERATE_QUEUE_SIZE = int(os.getenv("GENERATE_QUEUE_SIZE", "16"))
+GENERATE_QUEUE_TIMEOUT = float(os.getenv("GENERATE_QUEUE_TIMEOUT", "5"))
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+
+generation_admission = AdmissionController(
+    GENERATE_MAX_IN_FLIGHT, GENERATE_QUEUE_SIZE, GENERATE_QUEUE_TIMEOUT
+)
+rate_limiter = RateLimiter(RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST)
+
+async def admit_generation(request: Request):
+    """Rate limit clients and cap concurrent generations, shedding the excess"""
+    try:
+        rate_limiter.check(request.client.host if request.client else "unknown")
+        await generation_admission.acquire()
+    except RejectedError as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    try:
+        yield
+    finally:
+        generation_admission.release()
+
+# Cache and store gauges, read at scrape time
+metrics.gauge("prompt_cache_entries", "Prompts indexed in the near-duplicate cache", lambda: len(prompt_cache))
+metrics.gauge("prompt_cache_hits_total", "Near-duplicate prompt cache hits", lambda: prompt_cache.hits, "counter")
+metrics.gauge("prompt_cache_misses_total", "Near-duplicate prompt cache misses", lambda: prompt_cache.misses, "counter")
+metrics.gauge(
+    "prompt_cache_hit_ratio",
+    "Share of prompt cache lookups that reused a generation",
+    lambda: prompt_cache.hits / max(prompt_cache.hits + prompt_cache.misses, 1),
+)
+metrics.gauge(
+    "template_registry_reloads_total",
+    "Times the template snapshot was reloaded from the database",
+    lambda: template_registry.reloads,
+    "counter",
+)
+metrics.gauge(
+    "component_library_reloads_total",
+    "Times edited component files were recompiled",
+    lambda: components.reloads,
+    "counter",
+)
+metrics.gauge("projects_stored", "Projects held in the in-memory store", lambda: len(projects))
+metrics.gauge("job_queue_depth", "Generation jobs waiting for a worker", lambda: job_queue.depth)
+metrics.gauge("jobs_completed_total", "Generation jobs completed", lambda: job_queue.completed, "counter")
+metrics.gauge("jobs_failed_total", "Generation jobs failed", lambda: job_queue.failed, "counter")
+metrics.gauge("generation_in_flight", "Generations currently admitted", lambda: generation_admission.in_flight)
+metrics.gauge("generation_queued", "Generations waiting for admission", lambda: generation_admission.queued)
+metrics.gauge(
+    "generation_rejected_total",
+    "Generations shed by admission control",
+    lambda: generation_admission.rejected,
+    "counter",
+)
+
+# Startup warm-up; /ready answers 503 until every step has finished
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
+
+# One prompt per template, covering the generator's main branches
+WARMUP_PROMPTS = {
+    "portfolio": "Photography portfolio with travel, nature, street and aerial galleries",
+    "business": "Modern corporate business website, responsive with SEO",
+    "ecommerce": "Ecommerce store for handmade jewelry",
+    "restaurant": "Restaurant and cafe with a minimal design",
+    None: "A website for my company",
+}
+
+# Read replicas (DATABASE_REPLICA_URLS) are probed every REPLICA_CHECK_INTERVAL
+# seconds; one that fails or lags is left out of rotation until it recovers
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+replica_set = None
+metrics.gauge(
+    "database_replicas_healthy",
+    "Read replicas currently in rotation",
+    lambda: sum(replica.healthy for replica in replica_set.replicas) if replica_set else 0,
+)
+metrics.gauge(
+    "database_replica_reads_total",
+    "Reads routed to a replica",
+    lambda: replica_set.replica_reads if replica_set else 0,
+    "counter",
+)
+metrics.gauge(
+    "database_primary_reads_total",
+    "Reads routed to the primary: recent writes, or no healthy replica",
+    lambda: replica_set.primary_reads if replica_set else 0,
+    "counter",
+)
+
+def warm_database():
+    global replica_set
+    # Imported here so SQLAlchemy loads during warm-up rather than before the first request
+    import database
+    if DB_MIGRATE_ON_STARTUP:
+        database.init_db()
+    else:
+        with database.get_engine().connect():
+            pass
+    replica_set = database.get_replicas()
+    replica_set.watch(REPLICA_CHECK_INTERVAL)
+
+def warm_templates():
+    for template, prompt in WARMUP_PROMPTS.items():
+        website = build_website(generate_website_content(prompt, template), template)
+        fragments.dumps(website)
+        page_weight.warm(website)
+        if prompt_cache.enabled:
+            prompt_cache.signature(prompt)
+
+warmup = Warmup()
+warmup.step("database", warm_database)
+warmup.step("templates", warm_templates)
+metrics.gauge("app_ready", "1 once startup warm-up has finished", lambda: warmup.ready)
+
+@app.on_event("startup")
+async def start_warmup():
+    # Run off the event loop so the server can answer /ready while warming up
+    app.state.warmup_task = asyncio.create_task(asyncio.to_thread(warmup.run))
+
+# Retention: projects older than RETENTION_TTL_DAYS, or beyond the newest
+# RETENTION_MAX_PROJECTS unpinned ones, are deleted; 0 turns either off
+RETENTION_TTL_DAYS = float(os.getenv("RETENTION_TTL_DAYS", "0"))
+RETENTION_MAX_PROJECTS = int(os.getenv("RETENTION_MAX_PROJECTS", "0"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+
+retention_task = None
+metrics.gauge(
+    "retention_rows_deleted_total",
+    "Stored projects deleted by retention",
+    lambda: retention_task.rows_deleted if retention_task else 0,
+    "counter",
+)
+metrics.gauge(
+    "retention_bytes_reclaimed_total",
+    "Database bytes returned to the filesystem by retention",
+    lambda: retention_task.bytes_reclaimed if retention_task else 0,
+    "counter",
+)
+
+@app.on_event("startup")
+async def start_job_workers():
+    await job_queue.start()
+
+@app.on_event("startup")
+async def start_component_watcher():
+    if COMPONENT_WATCH_INTERVAL > 0:
+        components.watch(COMPONENT_WATCH_INTERVAL)
+
+@app.on_event("startup")
+async def start_image_watcher():
+    if IMAGE_WATCH_INTERVAL > 0:
+        images.watch(IMAGE_WATCH_INTERVAL)
+
+@app.on_event("startup")
+async def clean_publish_staging():
+    await asyncio.to_thread(publisher.clean_staging)
+
+@app.on_event("startup")
+async def start_retention():
+    global retention_task
+    if RETENTION_TTL_DAYS <= 0 and RETENTION_MAX_PROJECTS <= 0:
+        return
+    import retention
+    policy = retention.RetentionPolicy(RETENTION_TTL_DAYS * 86400, RETENTION_MAX_PROJECTS, RETENTION_BATCH_SIZE)
+    retention_task = retention.RetentionTask(
+        policy, RETENTION_INTERVAL, lambda: retention.prune_memory(projects, policy), PERSIST_PROJECTS
+    )
+    retention_task.start(lambda: warmup.ready)
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    await job_queue.stop()
+
+@app.on_event("shutdown")
+async def stop_component_watcher():
+    components.stop()
+
+@app.on_event("shutdown")
+async def stop_image_watcher():
+    images.stop()
+
+@app.on_event("shutdown")
+async def stop_replica_checks():
+    if replica_set is not None:
+        await asyncio.to_thread(replica_set.stop)
+
+@app.on_event("shutdown")
+async def stop_retention():
+    if retention_task is not None:
+        await retention_task.stop()
+
+# Admin-only data endpoints (bulk export/import); hidden unless a token is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin(request: Request):
+    token = request.headers.get("x-admin-token", "")
+    if not ADMIN_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=404, detail="Not found")
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/admin/profiles/{request_id}", include_in_schema=False)
+async def get_profile(request_id: str, request: Request, format: str = "json", limit: int = 25):
+    """Get a stored request profile as JSON or as collapsed stacks"""
+    token = request.headers.get("x-profile-token") or request.query_params.get("profile_token", "")
+    if not PROFILE_ADMIN_TOKEN or not hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    profile = profile_store.get(request_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.to_dict(limit)
+
+@app.get("/api/admin/retention", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def get_retention():
+    """Retention settings and the reports of recent passes"""
+    return {
+        "enabled": retention_task is not None,
+        "ttl_days": RETENTION_TTL_DAYS,
+        "max_projects": RETENTION_MAX_PROJECTS,
+        "interval": RETENTION_INTERVAL,
+        "reports": list(retention_task.reports) if retention_task else [],
+    }
+
+@app.post("/api/admin/retention", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def run_retention():
+    """Run a retention pass now and return its report"""
+    if retention_task is None:
+        raise HTTPException(status_code=400, detail="Retention is not configured")
+    return await retention_task.run_once()
+
+@app.get("/api/admin/memory", include_in_schema=False, dependencies=[Depends(require_admin)])
+def get_memory(limit: int = 20):
+    """Memory held by the in-process stores and, when tracing, by allocation site"""
+    return {
+        "structures": structure_sizes({
+            "projects": projects,
+            "prompt_cache": prompt_cache,
+            "json_fragments": fragments,
+            "zip_compression_cache": compression_cache,
+        }),
+        "tracemalloc": allocation_tracer.report(limit),
     }
 
+@app.get("/api/admin/replicas", include_in_schema=False, dependencies=[Depends(require_admin)])
+def get_replica_status():
+    """Health, replay lag and read routing of the database replicas"""
+    if replica_set is None:
+        raise HTTPException(status_code=503, detail="Database warm-up has not finished")
+    return replica_set.to_dict()
+
 @app.get("/")
 async def root():
     return {"message": "AI Website Generator API"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once startup warm-up has finished, 503 until then"""
+    return FastJSONResponse(warmup.to_dict(), status_code=200 if warmup.ready else 503)
+
 @app.get("/api/templates")
-async def get_templates():
+def get_templates(request: Request):
     """Get available website templates"""
-    return {
-        "templates": [
-            {"id": "portfolio", "name": "Portfolio", "description": "Perfect for artists and photographers"},
-            {"id": "business", "name": "Business", "description": "Professional business website"},
-            {"id": "ecommerce", "name": "E-commerce", "description": "Online store template"},
-            {"id": "restaurant", "name": "Restaurant", "description": "Restaurant or cafe website"},
-            {"id": "custom", "name": "Custom", "description": "Generate from scratch based on your prompt"}
-        ]
-    }
+    snapshot = template_registry.snapshot()
+    headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return FastJSONResponse(snapshot.body, headers=headers)
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 3)
+
+def _finish_stage(stage: str, started: float) -> float:
+    """Record how long a generation stage took and return it in milliseconds"""
+    elapsed = time.perf_counter() - started
+    stage_latency.observe(elapsed, stage)
+    return round(elapsed * 1000, 3)
+
+def store_project(website_id: str, request: WebsiteRequest, website: dict, created: datetime,
+                  metadata: Optional[dict] = None):
+    """Save a generated website to the project store and the database"""
+    projects[website_id] = ProjectRecord(
+        website_id, request.prompt, request.template, request.style, created.timestamp(),
+        website["html"], website["css"], website["js"], website.get("pages"), metadata,
+    )
+    if PERSIST_PROJECTS:
+        import database
+        database.save_project({
+            "id": website_id,
+            "prompt": request.prompt,
+            "template": request.template,
+            "style": request.style,
+            "html": website["html"],
+            "css": website["css"],
+            "js": website["js"],
+            "meta_data": metadata,
+            "pages": website.get("pages"),
+            "created_at": created,
+        })
 
-@app.post("/api/generate", response_model=WebsiteResponse)
-async def generate_website(request: WebsiteRequest):
-    """Generate a website from prompt"""
-    try:
-        # Generate unique ID
-        website_id = str(uuid.uuid4())
-        
+def load_stored_project(website_id: str) -> Optional[ProjectRecord]:
+    """Read a project that is no longer in memory back from the database"""
+    import database
+    row = database.load_project(website_id)
+    if row is None:
+        return None
+    return ProjectRecord(
+        row["id"], row["prompt"], row["template"], row["style"], row["created_at"].timestamp(),
+        row["html"], row["css"], row["js"], row["pages"], row["meta_data"], row["pinned"],
+    )
+
+async def get_project(website_id: str) -> ProjectRecord:
+    project = projects.get(website_id)
+    if project is None and PERSIST_PROJECTS:
+        project = await run_in_threadpool(load_stored_project, website_id)
+    if project is None:
+        raise HTTPException(status_code=404, detail="Website not found")
+    return project
+
+def generate_events(request: WebsiteRequest):
+    """Generate, build and store a website, yielding (event, data) per stage
+
+    Component events carry the rendered HTML fragment; the final "complete"
+    event carries the response body, shaped like WebsiteResponse.
+    """
+    started = time.perf_counter()
+    
+    # Generate unique ID
+    website_id = str(uuid.uuid4())
+    
+    # Reuse an earlier generation for a near-duplicate prompt, as long as
+    # it covers every keyword this prompt asks for. Pages rendered before a
+    # template change are not reused, since its component list may differ,
+    # nor are pages rendered before a component file was edited.
+    stage_started = time.perf_counter()
+    template_version = template_registry.snapshot().version if request.template else 0
+    scope = (request.template, request.style, request.multi_page, template_version, images.version,
+             components.reloads)
+    features = prompt_features(request.prompt)
+    cached = prompt_cache.lookup(
+        request.prompt, scope, accept=lambda value: features <= value[0]
+    )
+    if cached is not None:
+        _, content, website = cached
+    else:
         # Generate content based on prompt
         content = generate_website_content(request.prompt, request.template)
+    yield "analysis", {"ms": _finish_stage("analysis", stage_started), "cached": cached is not None}
+    
+    if cached is None:
+        if request.multi_page:
+            stage_started = time.perf_counter()
+            website = build_pages(content, request.template)
+            yield "pages", {"names": list(website["pages"]), "ms": _finish_stage("render", stage_started)}
+        else:
+            # Build website section by section
+            html_components = []
+            above_fold = []
+            stage_started = time.perf_counter()
+            for name, html in render_components(content, request.template):
+                html_components.append(html)
+                if name in ABOVE_THE_FOLD:
+                    above_fold.append(html)
+                yield "component", {"name": name, "html": html, "ms": _finish_stage("render", stage_started)}
+                stage_started = time.perf_counter()
         
-        # Build website
-        website = build_website(content, request.template)
+            stage_started = time.perf_counter()
+            website = assemble_website(content, html_components, "".join(above_fold))
+            yield "assets", {
+                "ms": _finish_stage("assemble", stage_started),
+                "css_bytes": len(website["css"]),
+                "js_bytes": len(website["js"]),
+            }
         
-        # Store project
-        projects[website_id] = {
-            "id": website_id,
+        prompt_cache.insert(website_id, request.prompt, (features, content, website), scope)
+    
+    stage_started = time.perf_counter()
+    pages = website.get("pages")
+    # Sites are measured as deployed: multi-page ones by the home page linking
+    # the bundle, single pages with critical CSS as exported, linking style.css
+    # instead of carrying the full stylesheet inline for the editor
+    if pages:
+        weight = analyze_page_weight({**website, "html": pages["index.html"]})
+    elif critical_css is not None:
+        weight = analyze_page_weight({**website, "html": exported_page(website["html"])})
+    else:
+        weight = analyze_page_weight(website)
+    if weight is not None:
+        yield "page_weight", {**weight, "ms": _finish_stage("page_weight", stage_started)}
+    
+    # Store project
+    stage_started = time.perf_counter()
+    created = datetime.now()
+    created_at = created.isoformat()
+    store_project(website_id, request, website, created, {"page_weight": weight} if weight else None)
+    yield "persisted", {"id": website_id, "ms": _finish_stage("store", stage_started)}
+    
+    # Built from values we produced ourselves, so it skips model validation
+    yield "complete", {
+        "id": website_id,
+        "html": website["html"],
+        "css": website["css"],
+        "js": website["js"],
+        **({"pages": pages} if pages else {}),
+        "metadata": {
             "prompt": request.prompt,
             "template": request.template,
             "style": request.style,
-            "created_at": datetime.now().isoformat(),
-            **website
+            "created_at": created_at,
+            "generation_ms": _elapsed_ms(started),
+            **({"page_weight": weight} if weight else {}),
         }
-        
-        return WebsiteResponse(
-            id=website_id,
-            html=website["html"],
-            css=website["css"],
-            js=website["js"],
-            metadata={
-                "prompt": request.prompt,
-                "template": request.template,
-                "style": request.style,
-                "created_at": datetime.now().isoformat()
-            }
-        )
-        
+    }
+
+def create_website(request: WebsiteRequest) -> dict:
+    """Generate, build and store a website for a request"""
+    for event, data in generate_events(request):
+        if event == "complete":
+            return data
+
+def render_response(response: dict) -> FastJSONResponse:
+    """Serialize a generated website into the HTTP response"""
+    return FastJSONResponse(fragments.dumps(response))
+
+def _sse_stream(request: WebsiteRequest):
+    try:
+        for event, data in generate_events(request):
+            yield b"event: %s\ndata: %s\n\n" % (event.encode(), fragments.dumps(data))
+    except Exception as e:
+        yield b"event: error\ndata: %s\n\n" % fragments.dumps({"detail": str(e)})
+
+@app.post("/api/generate", response_model=WebsiteResponse, dependencies=[Depends(admit_generation)])
+async def generate_website(request: WebsiteRequest, http_request: Request):
+    """Generate a website from prompt"""
+    profile = getattr(http_request.state, "profile", None)
+    try:
+        response = await run_in_threadpool(profiling.run, profile, create_website, request)
+        with stage_latency.time("serialize"):
+            return profiling.run(profile, render_response, response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/generate/stream", dependencies=[Depends(admit_generation)])
+async def generate_website_stream(prompt: str, template: Optional[str] = None, style: str = "modern",
+                                  multi_page: bool = False):
+    """Generate a website, streaming stage progress as Server-Sent Events"""
+    request = WebsiteRequest(prompt=prompt, template=template, style=style, multi_page=multi_page)
+    return StreamingResponse(
+        _sse_stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.post("/api/jobs", status_code=202)
+async def enqueue_generation(request: JobRequest):
+    """Queue a website generation and return its job id immediately"""
+    try:
+        job = job_queue.submit(request, request.priority)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    return FastJSONResponse({"id": job.id, "status": job.status}, status_code=202)
+
+@app.get("/api/jobs/stats")
+async def get_job_stats():
+    """Queue depth, wait and run times of the generation job queue"""
+    return FastJSONResponse(job_queue.stats())
+
+@app.get("/api/stats/page-weight")
+async def get_page_weight_stats():
+    """Page weight of recently generated sites against the performance budgets"""
+    return FastJSONResponse({"enabled": PAGE_WEIGHT_ANALYSIS, **page_weight.stats()})
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get the status, result or error of a generation job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return FastJSONResponse(job.to_dict())
+
 @app.get("/api/preview/{website_id}")
 async def preview_website(website_id: str):
     """Get website for preview"""
-    if website_id not in projects:
-        raise HTTPException(status_code=404, detail="Website not found")
+    project = await get_project(website_id)
+    return FastJSONResponse(project.to_json())
+
+# ZIP downloads, streamed one file at a time
+EXPORT_ARCHIVE_MAX_PROJECTS = int(os.getenv("EXPORT_ARCHIVE_MAX_PROJECTS", "1000"))
+
+def project_files(project: ProjectRecord) -> list:
+    """(name, text) pairs of a project's downloadable files"""
+    # Records share one copy of the stylesheet and script and keep the same
+    # page object, which lets the ZIP writer and the JSON fragment cache
+    # reuse their compressed and escaped bytes
+    css, js, pages = project.css, project.js, project.pages
+    if pages:
+        # Pages name the bundle after the content it had when they were built
+        return [
+            *pages.items(),
+            (BUNDLE_CSS if css is ENHANCED_CSS else bundle_path("style", "css", css), css),
+            (BUNDLE_JS if js is ENHANCED_JS else bundle_path("script", "js", js), js),
+        ]
+    html = project.html_parts if critical_css is None else exported_page(project.html_parts)
+    return [("index.html", html), ("style.css", css), ("script.js", js)]
+
+def archive_entries(website_ids: list):
+    """ZIP entries for each project, under a folder named after its id"""
+    for website_id in website_ids:
+        project = projects.get(website_id)
+        if project is None and PERSIST_PROJECTS:
+            project = load_stored_project(website_id)
+        if project is None:
+            continue
+        modified = datetime.fromtimestamp(project.created)
+        for name, text in project_files(project):
+            yield f"{website_id}/{name}", text, modified
+
+def zip_response(files, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_zip(files),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/export/{website_id}.zip")
+async def export_website_zip(website_id: str):
+    """Download a website's files as a ZIP archive"""
+    project = await get_project(website_id)
+    modified = datetime.fromtimestamp(project.created)
+    return zip_response(
+        [(name, text, modified) for name, text in project_files(project)],
+        f"website-{website_id}.zip",
+    )
+
+@app.post("/api/export/archive")
+async def export_archive(request: ArchiveRequest):
+    """Download several websites as one ZIP archive, one folder per website"""
+    website_ids = list(dict.fromkeys(request.ids))
+    if not 1 <= len(website_ids) <= EXPORT_ARCHIVE_MAX_PROJECTS:
+        raise HTTPException(
+            status_code=400, detail=f"ids must list 1-{EXPORT_ARCHIVE_MAX_PROJECTS} websites"
+        )
+    
+    missing = [website_id for website_id in website_ids if website_id not in projects]
+    if missing and PERSIST_PROJECTS:
+        import database
+        stored = await run_in_threadpool(database.existing_project_ids, missing)
+        missing = [website_id for website_id in missing if website_id not in stored]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Websites not found: {', '.join(missing[:10])}")
     
-    return projects[website_id]
+    return zip_response(
+        archive_entries(website_ids),
+        f"websites-{datetime.now().strftime('%Y%m%d-%H%M%S')}.zip",
+    )
 
 @app.get("/api/export/{website_id}")
 async def export_website(website_id: str):
     """Export website as downloadable files"""
-    if website_id not in projects:
-        raise HTTPException(status_code=404, detail="Website not found")
-    
-    project = projects[website_id]
+    project = await get_project(website_id)
     
-    return {
+    return FastJSONResponse({
         "id": website_id,
-        "files": {
-            "index.html": project["html"],
-            "style.css": project["css"],
-            "script.js": project["js"]
-        },
-        "metadata": project.get("metadata", {})
+        "files": dict(project_files(project)),
+        "metadata": project.metadata
+    })
+
+async def set_pinned(website_id: str, pinned: bool) -> dict:
+    project = projects.get(website_id)
+    stored = False
+    if PERSIST_PROJECTS:
+        import database
+        stored = await run_in_threadpool(database.set_pinned, website_id, pinned)
+    if project is None and not stored:
+        raise HTTPException(status_code=404, detail="Website not found")
+    if project is not None:
+        project.pinned = pinned
+    return {"id": website_id, "pinned": pinned}
+
+@app.put("/api/projects/{website_id}/pin")
+async def pin_project(website_id: str):
+    """Exempt a project from retention"""
+    return await set_pinned(website_id, True)
+
+@app.delete("/api/projects/{website_id}/pin")
+async def unpin_project(website_id: str):
+    """Make a project subject to retention again"""
+    return await set_pinned(website_id, False)
+
+@app.post("/api/publish/{website_id}")
+async def publish_website(website_id: str):
+    """Publish a website as static files; the URL never changes content"""
+    project = await get_project(website_id)
+    digest = await run_in_threadpool(publisher.publish, {name: as_text(text) for name, text in project_files(project)})
+    return {"id": website_id, "digest": digest, "url": f"/sites/{digest}/"}
+
+@app.get("/images/{filename}")
+def get_image(filename: str):
+    """A source image or resized variant; variants are generated on first request"""
+    found = images.file_for(filename)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    path, media_type = found
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": IMMUTABLE})
+
+@app.post("/api/images/{name}", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def upload_image(name: str, request: Request):
+    """Add or replace a source image; pages generated afterwards use it"""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Images are limited to {IMAGE_MAX_BYTES} bytes")
+    try:
+        source = await run_in_threadpool(images.add, name, bytes(body))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "name": source.name,
+        "format": source.format,
+        "width": source.width,
+        "height": source.height,
+        "digest": source.digest,
     }
 
 @app.get("/api/projects")
 async def list_projects():
     """List all generated projects"""
-    return {
-        "projects": [
-            {
-                "id": project_id,
-                "prompt": project["prompt"],
-                "template": project.get("template"),
-                "created_at": project["created_at"]
-            }
-            for project_id, project in projects.items()
-        ]
-    }
+    return FastJSONResponse(projects.listing())
+
+@app.get("/api/projects/export.ndjson.gz", include_in_schema=False, dependencies=[Depends(require_admin)])
+def export_projects(since: Optional[datetime] = None):
+    """Stream every stored project as gzip-compressed NDJSON, oldest first"""
+    import project_dump
+    filename = f"projects-{datetime.now().strftime('%Y%m%d-%H%M%S')}.ndjson.gz"
+    return StreamingResponse(
+        project_dump.gzip_chunks(project_dump.export_rows(since)),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.post("/api/projects/import", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def import_projects(request: Request):
+    """Restore projects from an NDJSON body, gzipped or not; existing ids are skipped"""
+    import project_dump
+    reader = project_dump.NDJSONReader()
+    batcher = project_dump.Batcher()
+    inserted = 0
+    try:
+        async for chunk in request.stream():
+            for batch in batcher.add(reader.feed(chunk)):
+                inserted += await run_in_threadpool(project_dump.insert_batch, batch)
+        # The last line, if unterminated, can still fill a batch
+        for batch in batcher.add(reader.close()):
+            inserted += await run_in_threadpool(project_dump.insert_batch, batch)
+    except (ValueError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import after {inserted} inserted rows: {e}")
+    inserted += await run_in_threadpool(project_dump.insert_batch, batcher.drain())
+    return {"lines": reader.lines, "inserted": inserted, "skipped": reader.lines - inserted}
+
+@app.get("/api/projects/search")
+def search_projects(q: str, limit: int = 20, offset: int = 0):
+    """Full-text search over stored projects' prompts, templates and styles"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    if not 1 <= limit <= SEARCH_MAX_LIMIT or offset < 0:
+        raise HTTPException(status_code=400, detail=f"limit must be 1-{SEARCH_MAX_LIMIT} and offset >= 0")
+    
+    import database
+    import search
+    # Fetch one extra row to tell whether another page exists without counting
+    results = database.read_session(lambda db: search.search_projects(db, q, limit + 1, offset))
+    
+    return FastJSONResponse({
+        "query": q,
+        "results": results[:limit],
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(results) > limit else None,
+    })
 
 if __name__ == "__main__":
     import uvicorn
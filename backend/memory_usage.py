@@ -0,0 +1,88 @@
+"""Memory used by the in-process stores, for the admin memory report
+
+Two views: the size of each named structure, found by walking the objects
+it references, and tracemalloc's allocations by source line, with the growth
+since the previous report. The walk counts an object shared between
+structures once, under the first structure that reaches it; classes,
+functions and modules are left out.
+"""
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
+import gc
+import sys
+import threading
+import tracemalloc
+
+SKIPPED_TYPES = (type, ModuleType, FunctionType, BuiltinFunctionType, MethodType)
+
+
+def deep_size(root, seen: set) -> int:
+    """Bytes of ``root`` and everything it references that is not in ``seen``"""
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def structure_sizes(structures: dict) -> dict:
+    """``{name: {"bytes", "items", "bytes_per_item"}}`` for sized containers"""
+    seen = set()
+    report = {}
+    for name, structure in structures.items():
+        size = deep_size(structure, seen)
+        items = len(structure) if hasattr(structure, "__len__") else None
+        report[name] = {
+            "bytes": size,
+            "items": items,
+            "bytes_per_item": round(size / items, 1) if items else None,
+        }
+    return report
+
+
+class AllocationTracer:
+    """tracemalloc snapshots, compared with the one taken by the previous report"""
+
+    def __init__(self):
+        self._previous = None
+        self._lock = threading.Lock()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def report(self, limit: int = 20) -> dict:
+        if not tracemalloc.is_tracing():
+            return {"tracing": False}
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        with self._lock:
+            previous, self._previous = self._previous, snapshot
+        report = {
+            "tracing": True,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "top": [
+                {"location": _location(stat.traceback), "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:limit]
+            ],
+        }
+        if previous is not None:
+            report["growth"] = [
+                {"location": _location(stat.traceback), "bytes": stat.size_diff, "count": stat.count_diff}
+                for stat in snapshot.compare_to(previous, "lineno")[:limit]
+                if stat.size_diff
+            ]
+        return report
+
+
+def _location(traceback) -> str:
+    frame = traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
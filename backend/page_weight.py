@@ -0,0 +1,226 @@
+"""Page weight metrics and performance budgets for generated websites
+
+The analyzer works on the generated strings, without a browser: it counts
+bytes, elements, images, render-blocking resources and the timers and
+observers the script starts, then checks them against budgets. Shared
+assets such as the stylesheet and script are analyzed once and cached, so
+a page costs one pass over its own markup, a few hundred microseconds.
+"""
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+import re
+import threading
+import time
+import zlib
+
+ELEMENT = re.compile(r"<[a-zA-Z]")
+IMG = re.compile(r"<img\b[^>]*>")
+IMG_WIDTH = re.compile(r'\swidth="(\d+)"')
+IMG_HEIGHT = re.compile(r'\sheight="(\d+)"')
+STYLESHEET = re.compile(r"<link\b[^>]*\brel=\"stylesheet\"[^>]*>")
+PRELOADED_STYLE = re.compile(r"<link\b[^>]*\brel=\"preload\"[^>]*\bas=\"style\"")
+SCRIPT_SRC = re.compile(r"<script\b([^>]*)\bsrc=")
+NOSCRIPT = re.compile(r"<noscript>.*?</noscript>", re.S)
+INLINE_STYLE = re.compile(r"<style[^>]*>(.*?)</style>", re.S)
+TIMERS = re.compile(r"\b(?:setInterval|setTimeout|requestAnimationFrame)\s*\(")
+OBSERVERS = re.compile(r"\bnew\s+(?:Intersection|Mutation|Resize|Performance)Observer\b")
+LISTENERS = re.compile(r"\baddEventListener\s*\(\s*['\"](?:scroll|resize|mousemove|touchmove)['\"]")
+
+# Budgets apply to the flat metric names below; a page over any of them gets a warning
+DEFAULT_BUDGETS = {
+    "page_bytes": 150_000,
+    "page_gzip_bytes": 40_000,
+    "dom_nodes": 800,
+    "images": 40,
+    "images_without_dimensions": 0,
+    "render_blocking": 2,
+    "timers": 4,
+}
+
+
+def parse_budgets(spec: str) -> Dict[str, int]:
+    """Budgets from ``"name=limit,name=limit"``, on top of the defaults"""
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, limit = item.partition("=")
+        if name.strip() not in DEFAULT_BUDGETS:
+            raise ValueError(f"unknown page budget {name.strip()!r}")
+        budgets[name.strip()] = int(limit)
+    return budgets
+
+
+def gzip_size(data: bytes, level: int = 6) -> int:
+    # Raw deflate plus gzip's 18 bytes of header and trailer
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return len(compressor.compress(data)) + len(compressor.flush()) + 18
+
+
+class _AssetCache:
+    """Analysis of shared assets, keyed by string identity"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str, analyze) -> dict:
+        key = (id(text), analyze)
+        cached = self._entries.get(key)
+        if cached is not None and cached[0] is text:
+            return cached[1]
+        result = analyze(text)
+        with self._lock:
+            # Holding the string keeps its id from being reused while cached
+            self._entries[key] = (text, result)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+
+def _asset_bytes(text: str) -> dict:
+    data = text.encode("utf-8")
+    return {"raw": len(data), "gzip": gzip_size(data)}
+
+
+def _script_activity(js: str) -> dict:
+    return {
+        "timers": len(TIMERS.findall(js)),
+        "observers": len(OBSERVERS.findall(js)),
+        "listeners": len(LISTENERS.findall(js)),
+    }
+
+
+class PageWeightAnalyzer:
+    """Analyzes generated pages against budgets and keeps aggregate statistics"""
+
+    def __init__(self, budgets: Optional[Dict[str, int]] = None, window: int = 1000):
+        self.budgets = dict(DEFAULT_BUDGETS if budgets is None else budgets)
+        self.window = window
+        self.analyzed = 0
+        self.warnings = {name: 0 for name in self.budgets}
+        self._samples = {}
+        self._assets = _AssetCache()
+        self._lock = threading.Lock()
+
+    def warm(self, website: dict):
+        """Analyze a page's shared assets ahead of its first real analysis"""
+        self._assets.get(website["css"], _asset_bytes)
+        self._assets.get(website["js"], _asset_bytes)
+        self._assets.get(website["js"], _script_activity)
+
+    def analyze(self, website: dict) -> dict:
+        """Metrics for a page built by ``assemble_website``, with budget warnings"""
+        started = time.perf_counter()
+        html, css, js = website["html"], website["css"], website["js"]
+        css_bytes = self._assets.get(css, _asset_bytes)
+        js_bytes = self._assets.get(js, _asset_bytes)
+        activity = self._assets.get(js, _script_activity)
+
+        # The inline stylesheet and script are accounted for from the cache;
+        # only the rest of the page is scanned and compressed here
+        markup = html
+        page_raw = page_gzip = 0
+        css_in_head = js_inline = False
+        for asset, size in ((css, css_bytes), (js, js_bytes)):
+            position = markup.find(asset) if asset else -1
+            if position >= 0:
+                css_in_head = css_in_head or (asset is css and position < markup.find("</head>"))
+                js_inline = js_inline or asset is js
+                markup = markup[:position] + markup[position + len(asset):]
+                page_raw += size["raw"]
+                page_gzip += size["gzip"]
+        markup_bytes = _asset_bytes(markup)
+        page_raw += markup_bytes["raw"]
+        page_gzip += markup_bytes["gzip"]
+
+        # Fallbacks for browsers without JavaScript do not block the others
+        head = NOSCRIPT.sub("", markup[:markup.find("</head>")])
+        # Linked instead of inlined: the stylesheet and script are still downloaded
+        linked = []
+        if STYLESHEET.search(head) or PRELOADED_STYLE.search(head):
+            linked.append(css_bytes)
+        if js and not js_inline and SCRIPT_SRC.search(markup):
+            linked.append(js_bytes)
+        for size in linked:
+            page_raw += size["raw"]
+            page_gzip += size["gzip"]
+
+        images = IMG.findall(markup)
+        sized = [tag for tag in images if IMG_WIDTH.search(tag) and IMG_HEIGHT.search(tag)]
+        blocking_scripts = sum(
+            1 for attributes in SCRIPT_SRC.findall(head) if "async" not in attributes and "defer" not in attributes
+        )
+        blocking_styles = len(STYLESHEET.findall(head))
+        inline_css_bytes = sum(len(block.encode("utf-8")) for block in INLINE_STYLE.findall(head))
+        if css_in_head:
+            inline_css_bytes += css_bytes["raw"]
+
+        metrics = {
+            "bytes": {
+                "html": markup_bytes,
+                "css": css_bytes,
+                "js": js_bytes,
+                "page": {"raw": page_raw, "gzip": page_gzip},
+            },
+            "dom_nodes": len(ELEMENT.findall(markup)),
+            "images": {
+                "count": len(images),
+                "with_dimensions": len(sized),
+                "lazy": sum(1 for tag in images if 'loading="lazy"' in tag),
+                "declared_pixels": sum(
+                    int(IMG_WIDTH.search(tag).group(1)) * int(IMG_HEIGHT.search(tag).group(1)) for tag in sized
+                ),
+            },
+            "render_blocking": {
+                "stylesheets": blocking_styles,
+                "scripts": blocking_scripts,
+                "inline_css_bytes": inline_css_bytes,
+            },
+            "script": dict(activity),
+        }
+        flat = {
+            "page_bytes": page_raw,
+            "page_gzip_bytes": page_gzip,
+            "dom_nodes": metrics["dom_nodes"],
+            "images": len(images),
+            "images_without_dimensions": len(images) - len(sized),
+            "render_blocking": blocking_styles + blocking_scripts,
+            "timers": activity["timers"],
+        }
+        metrics["warnings"] = [
+            {"metric": name, "value": flat[name], "budget": budget}
+            for name, budget in self.budgets.items() if flat[name] > budget
+        ]
+        metrics["analysis_us"] = round((time.perf_counter() - started) * 1e6, 1)
+        self._record(flat, metrics["warnings"])
+        return metrics
+
+    def _record(self, flat: dict, warnings: list):
+        with self._lock:
+            self.analyzed += 1
+            for name, value in flat.items():
+                samples = self._samples.get(name)
+                if samples is None:
+                    samples = self._samples[name] = deque(maxlen=self.window)
+                samples.append(value)
+            for warning in warnings:
+                self.warnings[warning["metric"]] += 1
+
+    def stats(self) -> dict:
+        """Aggregates over the most recent ``window`` pages"""
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            warnings = dict(self.warnings)
+            analyzed = self.analyzed
+        metrics = {}
+        for name, ordered in samples.items():
+            count = len(ordered)
+            metrics[name] = {
+                "mean": round(sum(ordered) / count, 1),
+                "p50": ordered[count // 2],
+                "p95": ordered[min(count - 1, int(count * 0.95))],
+                "max": ordered[-1],
+                "budget": self.budgets.get(name),
+                "over_budget_total": warnings.get(name, 0),
+            }
+        return {"analyzed": analyzed, "window": self.window, "metrics": metrics}
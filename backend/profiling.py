@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Sequence
+from urllib.parse import parse_qs
+import hmac
+import sys
+import threading
+import time
+import uuid
+
+
+def _frame_key(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def _builtin_key(func) -> str:
+    module = getattr(func, "__module__", None) or "builtins"
+    return f"{module}.{getattr(func, '__qualname__', repr(func))}"
+
+
+class Profile:
+    """Deterministic profile of one request
+
+    Only code run through :meth:`call` is traced. Every call is timed, so the
+    collapsed stacks are exact rather than sampled, at the price of slowing the
+    profiled request down several times over.
+    """
+
+    def __init__(self, request_id: str, stages: Dict[str, Sequence[str]] = None):
+        self.request_id = request_id
+        self.stages = stages or {}
+        self.started = time.perf_counter()
+        self.finished = None
+        self.path = None
+        # function -> [calls, self seconds, total seconds]
+        self._functions = {}
+        # "a;b;c" -> self seconds
+        self._stacks = {}
+        self._lock = threading.Lock()
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Run ``fn`` under the profiler on the current thread"""
+        # Each entry: [function key, stack path, start time, child seconds]
+        stack = []
+        functions = {}
+        stacks = {}
+        clock = time.perf_counter
+
+        def enter(key):
+            path = f"{stack[-1][1]};{key}" if stack else key
+            stack.append([key, path, clock(), 0.0])
+
+        def leave():
+            key, path, started, children = stack.pop()
+            elapsed = clock() - started
+            own = elapsed - children
+            if stack:
+                stack[-1][3] += elapsed
+            stats = functions.get(key)
+            if stats is None:
+                stats = functions[key] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += own
+            stats[2] += elapsed
+            stacks[path] = stacks.get(path, 0.0) + own
+
+        def tracer(frame, event, arg):
+            if event == "call":
+                enter(_frame_key(frame))
+            elif event == "c_call":
+                enter(_builtin_key(arg))
+            elif stack and event in ("return", "c_return", "c_exception"):
+                leave()
+
+        sys.setprofile(tracer)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sys.setprofile(None)
+            self._merge(functions, stacks)
+
+    def _merge(self, functions: dict, stacks: dict):
+        with self._lock:
+            for key, (calls, own, total) in functions.items():
+                stats = self._functions.setdefault(key, [0, 0.0, 0.0])
+                stats[0] += calls
+                stats[1] += own
+                stats[2] += total
+            for path, own in stacks.items():
+                self._stacks[path] = self._stacks.get(path, 0.0) + own
+
+    def finish(self, path: str = None):
+        self.finished = time.perf_counter()
+        self.path = path
+
+    def stage_times(self) -> dict:
+        """Total milliseconds spent in the functions of each configured stage
+
+        Taken from the collapsed stacks, so a stage function called from
+        another one of the same stage is not counted twice.
+        """
+        totals = {}
+        for stage, names in self.stages.items():
+            seconds = sum(
+                own
+                for path, own in self._stacks.items()
+                if any(key.rsplit(":", 1)[-1] in names for key in path.split(";"))
+            )
+            totals[stage] = round(seconds * 1000, 3)
+        return totals
+
+    def top(self, limit: int = 25) -> list:
+        ranked = sorted(self._functions.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {
+                "function": key,
+                "calls": calls,
+                "self_ms": round(own * 1000, 3),
+                "total_ms": round(total * 1000, 3),
+            }
+            for key, (calls, own, total) in ranked[:limit]
+        ]
+
+    def collapsed(self) -> str:
+        """Collapsed stacks with microsecond weights, as read by flamegraph tools"""
+        return "".join(
+            f"{path} {max(1, round(own * 1e6))}\n"
+            for path, own in sorted(self._stacks.items())
+        )
+
+    def to_dict(self, limit: int = 25) -> dict:
+        finished = self.finished or time.perf_counter()
+        return {
+            "request_id": self.request_id,
+            "path": self.path,
+            "wall_ms": round((finished - self.started) * 1000, 3),
+            "stages": self.stage_times(),
+            "top": self.top(limit),
+            "collapsed": self.collapsed(),
+        }
+
+
+def run(profile: Optional[Profile], fn: Callable, *args, **kwargs):
+    """Call ``fn``, under ``profile`` when the request is being profiled"""
+    if profile is None:
+        return fn(*args, **kwargs)
+    return profile.call(fn, *args, **kwargs)
+
+
+class ProfileStore:
+    """Keeps the most recent profiles keyed by request id"""
+
+    def __init__(self, max_profiles: int = 100):
+        self.max_profiles = max_profiles
+        self._profiles = OrderedDict()
+
+    def add(self, profile: Profile):
+        self._profiles[profile.request_id] = profile
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[Profile]:
+        return self._profiles.get(request_id)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests carrying the admin profiling token
+
+    The token is accepted from the ``X-Profile-Token`` header or the
+    ``profile_token`` query parameter. A profiled request gets a
+    ``Profile`` on ``request.state.profile`` and an ``X-Profile-Id``
+    response header naming where the result is stored.
+    """
+
+    def __init__(self, app, token: str, store: ProfileStore,
+                 stages: Dict[str, Sequence[str]] = None):
+        self.app = app
+        self.token = token.encode()
+        self.store = store
+        self.stages = stages
+
+    def authorized(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == b"x-profile-token":
+                return hmac.compare_digest(value, self.token)
+        if b"profile_token" in scope["query_string"]:
+            query = parse_qs(scope["query_string"].decode())
+            for value in query.get("profile_token", []):
+                return hmac.compare_digest(value.encode(), self.token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.authorized(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(str(uuid.uuid4()), self.stages)
+        scope.setdefault("state", {})["profile"] = profile
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.request_id.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.finish(scope["path"])
+            self.store.add(profile)
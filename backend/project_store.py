@@ -0,0 +1,163 @@
+"""Compact in-memory records of generated projects
+
+A plain dict per project repeats its key strings, keeps the creation time as
+an ISO string and holds every page with its own inlined copy of the shared
+stylesheet and script. A :class:`ProjectRecord` has fixed slots, interns the
+template and style names, keeps the creation time as a float and stores the
+page as parts around one shared copy of each registered text. Metadata is
+kept serialized. ``benchmarks/bench_project_memory.py`` compares the two.
+"""
+from datetime import datetime
+from typing import Dict, Optional, Union
+import sys
+
+import orjson
+
+from fastjson import JoinedText, fragments
+
+
+class SharedText:
+    """Large strings that many projects repeat, kept once"""
+
+    def __init__(self):
+        self._texts: Dict[str, str] = {}
+
+    def pin(self, text: str):
+        self._texts[text] = text
+
+    def share(self, text: str) -> str:
+        """The registered copy of ``text`` if there is one, else ``text`` itself"""
+        return self._texts.get(text, text)
+
+    def split(self, html: str) -> Union[str, JoinedText]:
+        """``html`` as parts, the registered texts it contains being the shared copies"""
+        found = []
+        for text in self._texts:
+            position = html.find(text)
+            if position >= 0:
+                found.append((position, text))
+        if not found:
+            return html
+        parts = []
+        end = 0
+        for position, text in sorted(found):
+            if position < end:
+                continue  # overlaps a text already taken out
+            parts.append(html[end:position])
+            parts.append(text)
+            end = position + len(text)
+        parts.append(html[end:])
+        return JoinedText(parts)
+
+
+shared_text = SharedText()
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class ProjectRecord:
+    __slots__ = ("id", "prompt", "template", "style", "created", "pinned", "css", "js", "pages",
+                 "_html", "_metadata")
+
+    def __init__(self, id: str, prompt: str, template: Optional[str], style: Optional[str],
+                 created: float, html: str, css: str, js: str, pages: Optional[dict] = None,
+                 metadata: Optional[dict] = None, pinned: bool = False):
+        self.id = id
+        self.prompt = prompt
+        # A handful of distinct values shared by every project
+        self.template = _intern(template)
+        self.style = _intern(style)
+        self.created = created
+        self.pinned = pinned
+        self.css = shared_text.share(css)
+        self.js = shared_text.share(js)
+        self.pages = pages
+        self._html = shared_text.split(html)
+        self._metadata = orjson.dumps(metadata) if metadata else None
+
+    @property
+    def html(self) -> str:
+        html = self._html
+        return html if isinstance(html, str) else "".join(html)
+
+    @property
+    def html_parts(self) -> Union[str, JoinedText]:
+        """The page as stored; the same object on every access, unlike ``html``,
+        so caches keyed by identity find it again"""
+        return self._html
+
+    @property
+    def metadata(self) -> dict:
+        return orjson.loads(self._metadata) if self._metadata else {}
+
+    @property
+    def created_at(self) -> str:
+        return datetime.fromtimestamp(self.created).isoformat()
+
+    def summary(self) -> dict:
+        return {"id": self.id, "prompt": self.prompt, "template": self.template, "created_at": self.created_at}
+
+    def to_dict(self) -> dict:
+        return self._fields(self.html)
+
+    def to_json(self) -> bytes:
+        """``to_dict()`` as JSON; the page is serialized from its parts, whose
+        escaped forms the fragment cache keeps"""
+        return fragments.dumps(self._fields(self.html_parts))
+
+    def _fields(self, html) -> dict:
+        project = {
+            "id": self.id,
+            "prompt": self.prompt,
+            "template": self.template,
+            "style": self.style,
+            "created_at": self.created_at,
+            "pinned": self.pinned,
+            "metadata": self.metadata,
+            "html": html,
+            "css": self.css,
+            "js": self.js,
+        }
+        if self.pages:
+            project["pages"] = self.pages
+        return project
+
+
+class ProjectStore(dict):
+    """Projects by id in creation order; the project listing is cached between changes"""
+
+    def __init__(self):
+        super().__init__()
+        self.version = 0
+        self._listing = None
+
+    def __setitem__(self, key: str, record: ProjectRecord):
+        super().__setitem__(key, record)
+        self.version += 1
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key)
+        self.version += 1
+
+    def pop(self, key: str, *default):
+        record = super().pop(key, *default)
+        self.version += 1
+        return record
+
+    def clear(self):
+        super().clear()
+        self.version += 1
+
+    def listing(self) -> bytes:
+        """The JSON body of the project list"""
+        cached = self._listing
+        if cached is not None and cached[0] == self.version:
+            return cached[1]
+        version = self.version
+        # list() copies the values in one step, so writers on other threads
+        # cannot change the dict while it is walked
+        body = orjson.dumps({"projects": [record.summary() for record in list(self.values())]})
+        self._listing = (version, body)
+        return body
@@ -0,0 +1,177 @@
+from collections import OrderedDict
+from array import array
+from functools import lru_cache
+import hashlib
+import re
+import threading
+
+# Words that carry no meaning for what kind of site is being asked for
+STOPWORDS = frozenset({
+    "a", "an", "and", "the", "for", "with", "of", "to", "in", "on", "at", "by",
+    "my", "our", "your", "me", "us", "i", "we", "it", "is", "be", "that", "this",
+    "create", "build", "make", "design", "want", "need", "please", "site",
+    "website", "web", "page", "some",
+})
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MAX_HASH = (1 << 32) - 1
+
+
+def prompt_shingles(prompt: str, stem_length: int = 5) -> set:
+    """Split a prompt into normalized word shingles
+
+    Words are lowercased, stopwords dropped and each word cut down to a short
+    prefix, so "photographer" and "photography" end up as the same shingle.
+    """
+    return {
+        token[:stem_length]
+        for token in _TOKEN_RE.findall(prompt.lower())
+        if token not in STOPWORDS
+    }
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hashes(shingle: str, seed: int, num_perm: int) -> array:
+    # One extendable-output hash yields all num_perm independent 32-bit hashes
+    digest = hashlib.shake_128(b"%d:%s" % (seed, shingle.encode())).digest(4 * num_perm)
+    return array("I", digest)
+
+
+class _Entry:
+    __slots__ = ("signature", "scope", "band_keys", "value")
+
+    def __init__(self, signature, scope, band_keys, value):
+        self.signature = signature
+        self.scope = scope
+        self.band_keys = band_keys
+        self.value = value
+
+
+class PromptCache:
+    """Near-duplicate prompt cache backed by MinHash signatures and LSH banding
+
+    Entries are only ever reused for a lookup with an equal ``scope``; callers
+    put everything into the scope that must match exactly (template, style)
+    and let the signature decide whether the wording is close enough. An
+    optional ``accept`` predicate can veto individual cached values.
+    """
+
+    def __init__(self, threshold: float = 0.7, max_entries: int = 10000,
+                 num_perm: int = 32, bands: int = 8, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.seed = seed
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def signature(self, prompt: str) -> array:
+        """Compute the MinHash signature of a prompt"""
+        rows = [
+            _shingle_hashes(shingle, self.seed, self.num_perm)
+            for shingle in prompt_shingles(prompt)
+        ]
+        if not rows:
+            return array("I", [_MAX_HASH] * self.num_perm)
+        if len(rows) == 1:
+            return rows[0]
+        return array("I", map(min, zip(*rows)))
+
+    def _band_keys(self, signature: array) -> tuple:
+        rows = self.rows
+        return tuple(
+            hash(tuple(signature[i * rows:(i + 1) * rows]))
+            for i in range(self.bands)
+        )
+
+    def similarity(self, a: array, b: array) -> float:
+        """Estimate the Jaccard similarity of two signatures"""
+        return sum(x == y for x, y in zip(a, b)) / self.num_perm
+
+    def lookup(self, prompt: str, scope=None, accept=None):
+        """Return the cached value of the most similar prompt, or None"""
+        if not self.enabled:
+            return None
+
+        signature = self.signature(prompt)
+        band_keys = self._band_keys(signature)
+
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, band_keys):
+                keys = bucket.get(key)
+                if keys:
+                    candidates.update(keys)
+
+            best_key, best_score = None, self.threshold
+            for key in candidates:
+                entry = self._entries[key]
+                if entry.scope != scope:
+                    continue
+                score = self.similarity(signature, entry.signature)
+                if score >= best_score and (accept is None or accept(entry.value)):
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key].value
+
+    def insert(self, key: str, prompt: str, value, scope=None):
+        """Index a prompt under ``key`` so similar prompts can reuse ``value``"""
+        if not self.enabled:
+            return
+
+        signature = self.signature(prompt)
+        band_keys = self._band_keys(signature)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(signature, scope, band_keys, value)
+            for bucket, band_key in zip(self._buckets, band_keys):
+                bucket.setdefault(band_key, []).append(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def remove(self, key: str):
+        """Drop an entry from the index"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        for bucket, band_key in zip(self._buckets, entry.band_keys):
+            keys = bucket.get(band_key)
+            if keys is None:
+                continue
+            keys.remove(key)
+            if not keys:
+                del bucket[band_key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for bucket in self._buckets:
+                bucket.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,146 @@
+"""Publishes generated websites as content-addressed static files
+
+Layout under the publish root::
+
+    objects/ab/abcdef...      one file per distinct content, plus .gz/.br variants
+    sites/<digest>/index.html hard links into objects/, one directory per site
+    staging/                  scratch space for publishes in progress
+
+A site's digest covers all of its files, so a published directory never
+changes and can be cached forever. Directories are assembled in
+``staging/`` and renamed into ``sites/`` in one step, so readers see either
+the complete site or nothing. Content shared between sites, such as the
+stylesheet and script, is stored and compressed once.
+"""
+from typing import Dict
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+try:
+    import brotli
+except ImportError:  # Optional; sites are still served gzip-compressed
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Tiny files gain nothing from compression
+COMPRESS_MIN_BYTES = 256
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def site_digest(files: Dict[str, bytes]) -> str:
+    """Digest of a whole site: every file name and content, in name order"""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(name.encode("utf-8") + b"\0" + content_digest(files[name]).encode("ascii") + b"\0")
+    return digest.hexdigest()[:32]
+
+
+class Publisher:
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.sites_dir = os.path.join(root, "sites")
+        self.staging_dir = os.path.join(root, "staging")
+
+    def _ensure_dirs(self):
+        for directory in (self.objects_dir, self.sites_dir, self.staging_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def _write_atomic(self, path: str, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=self.staging_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # mkstemp creates owner-only files; a front proxy may serve these
+                os.fchmod(f.fileno(), 0o644)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _store_object(self, data: bytes) -> str:
+        """Path of the object holding ``data``, writing it and its variants if new"""
+        key = content_digest(data)
+        directory = os.path.join(self.objects_dir, key[:2])
+        path = os.path.join(directory, key)
+        if os.path.exists(path):
+            return path
+        os.makedirs(directory, exist_ok=True)
+        # Variants first, so an object is never visible without them
+        if len(data) >= COMPRESS_MIN_BYTES:
+            self._write_atomic(path + ".gz", gzip.compress(data, 9, mtime=0))
+            if brotli is not None:
+                self._write_atomic(path + ".br", brotli.compress(data))
+        self._write_atomic(path, data)
+        return path
+
+    def _link(self, source: str, target: str):
+        try:
+            os.link(source, target)
+        except OSError:
+            # Filesystems without hard links get a copy
+            shutil.copyfile(source, target)
+
+    def site_path(self, digest: str) -> str:
+        return os.path.join(self.sites_dir, digest)
+
+    def publish(self, files: Dict[str, str]) -> str:
+        """Publish ``{name: text}`` as a site and return its digest; idempotent"""
+        encoded = {name: text.encode("utf-8") for name, text in files.items()}
+        digest = site_digest(encoded)
+        final = self.site_path(digest)
+        if os.path.isdir(final):
+            return digest
+
+        self._ensure_dirs()
+        staged = tempfile.mkdtemp(dir=self.staging_dir)
+        try:
+            os.chmod(staged, 0o755)
+            for name, data in encoded.items():
+                source = self._store_object(data)
+                target = os.path.join(staged, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                for suffix in ("", ".gz", ".br"):
+                    if suffix == "" or os.path.exists(source + suffix):
+                        self._link(source + suffix, target + suffix)
+            try:
+                os.rename(staged, final)
+            except OSError:
+                # Another worker published the same site first
+                if not os.path.isdir(final):
+                    raise
+        finally:
+            if os.path.isdir(staged):
+                shutil.rmtree(staged, ignore_errors=True)
+        return digest
+
+    def clean_staging(self, max_age: float = 3600):
+        """Remove leftovers of publishes interrupted by a crash
+
+        Only entries older than ``max_age`` seconds are removed, so publishes
+        in progress in other workers are left alone.
+        """
+        if not os.path.isdir(self.staging_dir):
+            return
+        cutoff = time.time() - max_age
+        for entry in os.scandir(self.staging_dir):
+            try:
+                if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.unlink(entry.path)
+            except OSError:
+                logger.exception("cannot remove %s", entry.path)
@@ -0,0 +1,185 @@
+"""Routes reads across database replicas: round-robin with health checks
+
+Reads that can be served slightly stale go to the healthy replicas in turn;
+everything else, and every read while no replica is healthy, uses the
+primary. A background thread probes each replica every few seconds: it must
+answer a query on the projects table and, on Postgres, be at most
+``max_lag`` seconds behind the primary. A replica whose query fails in
+between is taken out of rotation until it passes a probe again.
+
+Reads of a project written moments ago by this process go to the primary
+(read-your-writes), since a replica may not have it yet.
+"""
+from collections import OrderedDict
+from typing import Optional
+import itertools
+import logging
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Replay lag of a Postgres standby in seconds. A standby that has replayed
+# everything it received is current however old its last transaction is, and
+# a server that is not a standby reports NULLs, so both count as 0
+POSTGRES_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class Replica:
+    __slots__ = ("engine", "healthy", "lag", "error", "checked_at")
+
+    def __init__(self, engine):
+        self.engine = engine
+        # In rotation until a probe or a query says otherwise
+        self.healthy = True
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "error": self.error,
+            "checked_at": self.checked_at,
+        }
+
+
+class ReplicaSet:
+    """The primary engine and its replicas, with read routing between them"""
+
+    def __init__(self, primary, replicas: list, probe, max_lag: float = 10,
+                 sticky_seconds: float = 30):
+        self.primary = primary
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.probe = probe
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.replica_reads = 0
+        self.primary_reads = 0
+        # Replica answers that had to be checked on the primary
+        self.stale_reads = 0
+        self._healthy = tuple(self.replicas)
+        self._turn = itertools.count()
+        # Project id -> time until which its reads stay on the primary; in
+        # expiry order, since every entry lives for the same time
+        self._recent_writes = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def wrote(self, key: str):
+        """Send reads of ``key`` to the primary for the next ``sticky_seconds``"""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes.pop(key, None)
+            self._recent_writes[key] = now + self.sticky_seconds
+            while self._recent_writes:
+                oldest, until = next(iter(self._recent_writes.items()))
+                if until > now:
+                    break
+                del self._recent_writes[oldest]
+
+    def read_engine(self, key: Optional[str] = None):
+        """A replica in turn, or the primary for recent writes and when none is healthy"""
+        healthy = self._healthy
+        if healthy and key is not None:
+            until = self._recent_writes.get(key)
+            if until is not None and until > time.monotonic():
+                healthy = ()
+        if not healthy:
+            self.primary_reads += 1
+            return self.primary
+        self.replica_reads += 1
+        return healthy[next(self._turn) % len(healthy)].engine
+
+    def read(self, query, key: Optional[str] = None, stale=None):
+        """Run ``query(connection)`` on a read engine
+
+        A replica's answer is replaced by the primary's when the replica
+        fails, or when ``stale(result)`` says it may not have caught up.
+        """
+        engine = self.read_engine(key)
+        if engine is not self.primary:
+            try:
+                with engine.connect() as conn:
+                    result = query(conn)
+                if stale is None or not stale(result):
+                    return result
+                self.stale_reads += 1
+            except SQLAlchemyError as e:
+                self.failed(engine, e)
+        with self.primary.connect() as conn:
+            return query(conn)
+
+    def failed(self, engine, error: Exception):
+        """Take a replica out of rotation until it passes a probe"""
+        for replica in self.replicas:
+            if replica.engine is engine and replica.healthy:
+                logger.warning("replica %s failed, reading from others: %s", engine.url, error)
+                replica.healthy = False
+                replica.error = str(error).splitlines()[0]
+                # Drop pooled connections, which may be broken
+                engine.dispose()
+        self._update()
+
+    def check(self):
+        """Probe every replica now"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    conn.execute(self.probe)
+                    lag = conn.execute(POSTGRES_LAG).scalar() if replica.engine.dialect.name == "postgresql" else 0
+                replica.lag = round(float(lag), 3)
+                replica.error = None if replica.lag <= self.max_lag else "lagging behind the primary"
+            except SQLAlchemyError as e:
+                replica.lag = None
+                replica.error = str(e).splitlines()[0]
+                replica.engine.dispose()
+            healthy = replica.error is None
+            if healthy != replica.healthy:
+                logger.warning("replica %s is %s", replica.engine.url, "back" if healthy else f"out: {replica.error}")
+            replica.healthy = healthy
+            replica.checked_at = time.time()
+        self._update()
+
+    def _update(self):
+        with self._lock:
+            self._healthy = tuple(replica for replica in self.replicas if replica.healthy)
+
+    def watch(self, interval: float):
+        """Probe the replicas every ``interval`` seconds on a daemon thread"""
+        if self._watcher is not None or not self.replicas:
+            return
+        self._stop.clear()
+
+        def loop():
+            self.check()
+            while not self._stop.wait(interval):
+                self.check()
+
+        self._watcher = threading.Thread(target=loop, name="replica-checks", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def to_dict(self) -> dict:
+        return {
+            "replicas": [replica.to_dict() for replica in self.replicas],
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "stale_reads": self.stale_reads,
+        }
@@ -0,0 +1,255 @@
+"""Deletes old projects and compacts the database
+
+Usage: python retention.py [--ttl-days 30] [--max-projects 100000] [--vacuum]
+
+A project is removed once it is older than the TTL, or when more than the
+maximum number of unpinned projects are stored, oldest first. Pinned
+projects are never removed and do not count towards the maximum. Rows are
+deleted in small batches, each in its own short transaction, so writers
+are never locked out for long. Each pass ends by returning free pages to
+the filesystem and refreshing planner statistics.
+"""
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from sqlalchemy import func, select
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# Pages returned to the filesystem per step of an incremental vacuum
+VACUUM_PAGES = 2000
+
+
+class RetentionPolicy:
+    def __init__(self, ttl_seconds: float = 0, max_projects: int = 0,
+                 batch_size: int = 500, batch_pause: float = 0.05):
+        self.ttl_seconds = ttl_seconds
+        self.max_projects = max_projects
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 or self.max_projects > 0
+
+    def cutoff(self, now: datetime) -> Optional[datetime]:
+        """Projects created before this time have expired"""
+        return now - timedelta(seconds=self.ttl_seconds) if self.ttl_seconds > 0 else None
+
+
+def prune_memory(projects: dict, policy: RetentionPolicy, now: Optional[datetime] = None) -> int:
+    """Drop expired and surplus projects from an in-memory store, oldest first
+
+    The store maps ids to ``ProjectRecord``s in creation order, as a dict
+    filled by inserts is. Other threads may add projects meanwhile, so the
+    store is walked from a snapshot.
+    """
+    if not policy.enabled:
+        return 0
+    cutoff = policy.cutoff(now or datetime.now())
+    cutoff = cutoff.timestamp() if cutoff else None
+    unpinned = [(pid, project) for pid, project in list(projects.items()) if not project.pinned]
+    surplus = len(unpinned) - policy.max_projects if policy.max_projects > 0 else 0
+    evicted = 0
+    for pid, project in unpinned:
+        if evicted >= surplus and (cutoff is None or project.created >= cutoff):
+            break
+        if projects.pop(pid, None) is not None:
+            evicted += 1
+    return evicted
+
+
+def _delete_batches(select_ids, policy: RetentionPolicy, limit: Optional[int] = None) -> int:
+    """Delete the rows chosen by ``select_ids(n)`` in batches; return how many went"""
+    table = database.Project.__table__
+    engine = database.get_engine()
+    deleted = 0
+    while limit is None or deleted < limit:
+        size = policy.batch_size if limit is None else min(policy.batch_size, limit - deleted)
+        with engine.begin() as conn:
+            ids = conn.execute(select_ids(size)).scalars().all()
+            if not ids:
+                break
+            deleted += conn.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+        if len(ids) < size:
+            break
+        # Let queued writers in between batches
+        time.sleep(policy.batch_pause)
+    return deleted
+
+
+def purge_expired(policy: RetentionPolicy, now: Optional[datetime] = None) -> int:
+    cutoff = policy.cutoff(now or datetime.now())
+    if cutoff is None:
+        return 0
+    table = database.Project.__table__
+    return _delete_batches(
+        lambda size: select(table.c.id)
+        .where(table.c.pinned == False, table.c.created_at < cutoff)  # noqa: E712
+        .order_by(table.c.created_at).limit(size),
+        policy,
+    )
+
+
+def purge_surplus(policy: RetentionPolicy) -> int:
+    if policy.max_projects <= 0:
+        return 0
+    table = database.Project.__table__
+    with database.get_engine().connect() as conn:
+        stored = conn.execute(
+            select(func.count()).select_from(table).where(table.c.pinned == False)  # noqa: E712
+        ).scalar()
+    surplus = stored - policy.max_projects
+    if surplus <= 0:
+        return 0
+    return _delete_batches(
+        lambda size: select(table.c.id)
+        .where(table.c.pinned == False)  # noqa: E712
+        .order_by(table.c.created_at, table.c.id).limit(size),
+        policy,
+        limit=surplus,
+    )
+
+
+def _sqlite_pragma(conn, name: str) -> int:
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def database_bytes(engine) -> int:
+    """Size of the whole database on SQLite, of the projects table on Postgres"""
+    with engine.connect() as conn:
+        if engine.dialect.name == "sqlite":
+            return _sqlite_pragma(conn, "page_count") * _sqlite_pragma(conn, "page_size")
+        if engine.dialect.name == "postgresql":
+            return conn.exec_driver_sql("SELECT pg_total_relation_size('projects')").scalar()
+    return 0
+
+
+def compact(engine, pause: float = 0.05, full: bool = False) -> dict:
+    """Return free space to the filesystem and refresh planner statistics"""
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            mode = _sqlite_pragma(conn, "auto_vacuum")
+            # Fold deleted entries in the search index into fewer segments
+            conn.exec_driver_sql("INSERT INTO projects_fts(projects_fts, rank) VALUES ('merge', 500)")
+            conn.commit()
+        raw = engine.raw_connection()
+        try:
+            driver = raw.driver_connection
+            if full:
+                # Rewrites the whole file; also switches older databases to
+                # incremental mode, since every connection asks for it
+                driver.executescript("VACUUM;")
+            elif mode == 2:
+                while driver.execute("PRAGMA freelist_count").fetchone()[0]:
+                    # The sqlite3 module only steps a pragma once, freeing a
+                    # single page; executescript runs it to completion
+                    driver.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES});")
+                    time.sleep(pause)
+            driver.executescript("PRAGMA optimize; PRAGMA wal_checkpoint(TRUNCATE);")
+            free_pages = driver.execute("PRAGMA freelist_count").fetchone()[0]
+        finally:
+            raw.close()
+        # 2 is INCREMENTAL; other databases reuse free pages but never shrink
+        return {"auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(mode, mode), "free_pages": free_pages}
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM (FULL, ANALYZE) projects" if full else "VACUUM (ANALYZE) projects")
+    return {}
+
+
+def enforce(policy: RetentionPolicy, now: Optional[datetime] = None, full_vacuum: bool = False) -> dict:
+    """Run one retention pass against the database and report what it reclaimed"""
+    engine = database.get_engine()
+    started = time.perf_counter()
+    bytes_before = database_bytes(engine)
+    expired = purge_expired(policy, now)
+    surplus = purge_surplus(policy)
+    details = compact(engine, policy.batch_pause, full_vacuum) if expired or surplus or full_vacuum else {}
+    bytes_after = database_bytes(engine)
+    return {
+        "finished_at": datetime.now().isoformat(),
+        "rows_deleted": expired + surplus,
+        "expired": expired,
+        "over_limit": surplus,
+        "bytes_before": bytes_before,
+        "bytes_after": bytes_after,
+        "bytes_reclaimed": max(bytes_before - bytes_after, 0),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        **details,
+    }
+
+
+class RetentionTask:
+    """Applies a retention policy periodically in the background
+
+    The in-memory store is pruned on the event loop, which owns it; database
+    work runs in a thread.
+    """
+
+    def __init__(self, policy: RetentionPolicy, interval: float,
+                 prune: Callable[[], int] = lambda: 0, persisted: bool = True,
+                 reports_kept: int = 20):
+        self.policy = policy
+        self.interval = interval
+        self.prune = prune
+        self.persisted = persisted
+        self.reports = deque(maxlen=reports_kept)
+        self.rows_deleted = 0
+        self.bytes_reclaimed = 0
+        self._task = None
+
+    async def run_once(self) -> dict:
+        evicted = self.prune()
+        report = await asyncio.to_thread(enforce, self.policy) if self.persisted else {}
+        report["memory_evicted"] = evicted
+        self.rows_deleted += report.get("rows_deleted", 0)
+        self.bytes_reclaimed += report.get("bytes_reclaimed", 0)
+        self.reports.append(report)
+        logger.info("retention pass: %s", report)
+        return report
+
+    async def _loop(self, ready: Callable[[], bool]):
+        while not ready():
+            await asyncio.sleep(1)
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("retention pass failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self, ready: Callable[[], bool] = lambda: True):
+        if self.policy.enabled and self._task is None:
+            self._task = asyncio.create_task(self._loop(ready))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete old projects and compact the database")
+    parser.add_argument("--ttl-days", type=float, default=0, help="delete projects older than this")
+    parser.add_argument("--max-projects", type=int, default=0, help="keep at most this many unpinned projects")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--vacuum", action="store_true", help="rewrite the whole database file")
+    args = parser.parse_args()
+
+    database.init_db()
+    policy = RetentionPolicy(args.ttl_days * 86400, args.max_projects, args.batch_size)
+    print(json.dumps(enforce(policy, full_vacuum=args.vacuum), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Full-text index over project prompts, templates and styles
+
+SQLite uses an FTS5 table kept in sync with ``projects`` by triggers;
+Postgres uses a generated ``tsvector`` column with a GIN index. Both are
+maintained by the database on every insert, update and delete, so the
+application only ever writes to ``projects``. Other databases fall back to
+an unindexed substring match.
+"""
+from typing import List
+import re
+
+from sqlalchemy import text
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_DDL = (
+    """CREATE VIRTUAL TABLE projects_fts USING fts5(
+        prompt, template, style,
+        content='projects', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    # Prompt matches outweigh template and style matches
+    "INSERT INTO projects_fts(projects_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')",
+    "INSERT INTO projects_fts(projects_fts) VALUES ('rebuild')",
+)
+
+SQLITE_TRIGGERS = (
+    """CREATE TRIGGER IF NOT EXISTS projects_fts_insert AFTER INSERT ON projects BEGIN
+        INSERT INTO projects_fts(rowid, prompt, template, style)
+        VALUES (new.rowid, new.prompt, new.template, new.style);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS projects_fts_delete AFTER DELETE ON projects BEGIN
+        INSERT INTO projects_fts(projects_fts, rowid, prompt, template, style)
+        VALUES ('delete', old.rowid, old.prompt, old.template, old.style);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS projects_fts_update AFTER UPDATE OF prompt, template, style ON projects BEGIN
+        INSERT INTO projects_fts(projects_fts, rowid, prompt, template, style)
+        VALUES ('delete', old.rowid, old.prompt, old.template, old.style);
+        INSERT INTO projects_fts(rowid, prompt, template, style)
+        VALUES (new.rowid, new.prompt, new.template, new.style);
+    END""",
+)
+
+SQLITE_INSERT_TRIGGER = SQLITE_TRIGGERS[0]
+
+POSTGRES_DDL = (
+    """ALTER TABLE projects ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(prompt, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(template, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(style, '')), 'C')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS projects_search_idx ON projects USING GIN (search_vector)",
+)
+
+# Rank and page inside the index first, so only one page of rows is joined
+SQLITE_SEARCH = text("""
+    SELECT p.id, p.prompt, p.template, p.style, p.created_at, m.rank AS score
+    FROM (
+        SELECT rowid, rank FROM projects_fts
+        WHERE projects_fts MATCH :query
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    ) AS m
+    JOIN projects p ON p.rowid = m.rowid
+    ORDER BY m.rank
+""")
+
+POSTGRES_SEARCH = text("""
+    SELECT id, prompt, template, style, created_at, ts_rank_cd(search_vector, query) AS score
+    FROM projects, to_tsquery('english', :query) AS query
+    WHERE search_vector @@ query
+    ORDER BY score DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+FALLBACK_SEARCH = text("""
+    SELECT id, prompt, template, style, created_at, 0 AS score
+    FROM projects
+    WHERE lower(prompt) LIKE :query
+    ORDER BY created_at DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+def init_search(engine):
+    """Create the index and its triggers if they are missing; idempotent"""
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            exists = conn.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'projects_fts'"
+            )).first()
+            if not exists:
+                # Rebuilding indexes any projects stored before search existed
+                for statement in SQLITE_DDL:
+                    conn.execute(text(statement))
+            for statement in SQLITE_TRIGGERS:
+                conn.execute(text(statement))
+        elif engine.dialect.name == "postgresql":
+            for statement in POSTGRES_DDL:
+                conn.execute(text(statement))
+
+
+def suspend_sqlite_indexing(conn) -> int:
+    """Drop the per-row insert trigger for the rest of this write transaction
+
+    Returns the highest rowid before the bulk insert. SQLite has a single
+    writer, so no other connection can insert while the trigger is gone, and
+    a rollback restores it. Must be paired with :func:`resume_sqlite_indexing`
+    in the same transaction.
+    """
+    conn.exec_driver_sql("DROP TRIGGER IF EXISTS projects_fts_insert")
+    return conn.exec_driver_sql("SELECT coalesce(max(rowid), 0) FROM projects").scalar()
+
+
+def resume_sqlite_indexing(conn, before: int):
+    """Index every row inserted since ``before`` in one statement and restore the trigger"""
+    conn.exec_driver_sql(
+        "INSERT INTO projects_fts(rowid, prompt, template, style) "
+        "SELECT rowid, prompt, template, style FROM projects WHERE rowid > ?",
+        (before,),
+    )
+    conn.exec_driver_sql(SQLITE_INSERT_TRIGGER)
+
+
+def query_terms(query: str) -> List[str]:
+    return TOKEN.findall(query.lower())
+
+
+def _isoformat(value) -> str:
+    # SQLite hands back the stored text, Postgres a datetime
+    if isinstance(value, str):
+        return value.replace(" ", "T", 1)
+    return value.isoformat()
+
+
+def search_projects(db, query: str, limit: int = 20, offset: int = 0) -> list:
+    """Projects matching every term of ``query``, best match first
+
+    The last term also matches as a prefix, so results show up while the
+    user is still typing a word.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        statement = SQLITE_SEARCH
+        match = " ".join('"%s"' % term for term in terms) + "*"
+    elif dialect == "postgresql":
+        statement = POSTGRES_SEARCH
+        match = " & ".join(terms) + ":*"
+    else:
+        statement = FALLBACK_SEARCH
+        match = "%" + "%".join(terms) + "%"
+
+    rows = db.execute(statement, {"query": match, "limit": limit, "offset": offset})
+    return [
+        {
+            "id": row.id,
+            "prompt": row.prompt,
+            "template": row.template,
+            "style": row.style,
+            "created_at": _isoformat(row.created_at),
+            # Higher is better on every backend (FTS5's bm25 is negative)
+            "score": round(abs(float(row.score)), 4),
+        }
+        for row in rows
+    ]
@@ -0,0 +1,162 @@
+"""Static file serving with precompressed variants, byte ranges and zero-copy sends
+
+``PublishedFiles`` is a ``StaticFiles`` for content-addressed directories:
+every response may be cached forever, and a ``.br`` or ``.gz`` file next to
+the requested one is served instead when the client accepts that encoding.
+"""
+from mimetypes import guess_type
+from typing import Optional, Tuple
+import os
+import re
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def accepted_encodings(header: str) -> set:
+    """Codings listed in an Accept-Encoding header, minus those with q=0"""
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding)
+    return accepted
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """The ``(start, end)`` inclusive byte range requested, or None for the whole file
+
+    Only single ranges are honoured; multi-range requests get the whole file,
+    which the spec allows. Raises ValueError for unsatisfiable ranges.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+class RangeFileResponse(FileResponse):
+    """A FileResponse that serves byte ranges and hands the body to the server when it can
+
+    Servers offering the ``http.response.zerocopysend`` ASGI extension get the
+    open file, and those offering ``http.response.pathsend`` get
+    the path of a full-file response, so the kernel copies the file straight
+    to the socket. Others fall back to reading the file in chunks.
+    """
+
+    def __init__(self, path: str, stat_result: os.stat_result, method: str,
+                 range_header: Optional[str] = None, if_range: Optional[str] = None, **kwargs):
+        super().__init__(path, stat_result=stat_result, method=method, **kwargs)
+        size = stat_result.st_size
+        self.headers["accept-ranges"] = "bytes"
+        self.offset, self.count = 0, size
+        if if_range is not None and if_range.strip('" ') not in (
+            self.headers["etag"].strip('"'), self.headers["last-modified"]
+        ):
+            # The client's partial copy is stale; send the whole file
+            range_header = None
+        try:
+            requested = parse_range(range_header, size)
+        except ValueError:
+            self.status_code = 416
+            self.headers["content-range"] = f"bytes */{size}"
+            self.headers["content-length"] = "0"
+            self.count = 0
+            return
+        if requested is not None:
+            start, end = requested
+            self.status_code = 206
+            self.offset, self.count = start, end - start + 1
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if self.send_header_only or not self.count:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+        elif "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.offset)
+                remaining = self.count
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining:
+                    # The file shrank under us; end the body rather than hang
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+
+class PublishedFiles(StaticFiles):
+    """Serves immutable, content-addressed files, preferring precompressed variants"""
+
+    async def check_config(self):
+        # The directory is created by the first publish; until then every
+        # path is simply not found
+        if self.directory is not None and not os.path.isdir(self.directory):
+            return
+        await super().check_config()
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type = guess_type(str(full_path))[0] or "text/plain"
+        path, encoding = full_path, None
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        for coding, suffix in ENCODINGS:
+            if coding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(f"{full_path}{suffix}")
+            except OSError:
+                continue
+            path, stat_result, encoding = f"{full_path}{suffix}", variant_stat, coding
+            break
+
+        response = RangeFileResponse(
+            path, stat_result, scope["method"],
+            range_header=request_headers.get("range"),
+            if_range=request_headers.get("if-range"),
+            media_type=media_type,
+        )
+        response.headers["cache-control"] = IMMUTABLE
+        response.headers["vary"] = "Accept-Encoding"
+        if encoding is not None:
+            response.headers["content-encoding"] = encoding
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
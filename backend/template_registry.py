@@ -0,0 +1,83 @@
+from typing import Optional
+import hashlib
+import threading
+import time
+
+import orjson
+
+VERSION_KEY = "templates"
+
+
+class TemplateSnapshot:
+    """Immutable view of the templates table at one version"""
+
+    __slots__ = ("version", "templates", "by_id", "body", "etag")
+
+    def __init__(self, version: int, templates: list):
+        self.version = version
+        self.templates = templates
+        self.by_id = {template["id"]: template for template in templates}
+        # The /api/templates body and its ETag are computed once per version
+        self.body = orjson.dumps({"templates": [
+            {key: template[key] for key in ("id", "name", "description")}
+            for template in templates
+        ]})
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()[:20]
+
+
+class TemplateRegistry:
+    """Templates loaded from the database into an in-memory snapshot
+
+    Readers get the current snapshot without touching the database. At most
+    once per ``check_interval`` seconds one reader compares the snapshot's
+    version with the ``registry_versions`` row, and reloads the table when
+    another worker (or a seed/migration) has bumped it.
+    """
+
+    def __init__(self, check_interval: float = 5.0):
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._snapshot = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> TemplateSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked < self.check_interval:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._checked >= self.check_interval:
+                self._refresh()
+            return self._snapshot
+
+    def _refresh(self):
+        # Imported lazily so the app can start serving before SQLAlchemy loads
+        import database
+
+        db = database.SessionLocal()
+        try:
+            version = database.get_version(db, VERSION_KEY)
+            if self._snapshot is None or version != self._snapshot.version:
+                rows = db.query(database.Template).order_by(
+                    database.Template.created_at, database.Template.id
+                ).all()
+                self._snapshot = TemplateSnapshot(version, [
+                    {
+                        "id": row.id,
+                        "name": row.name,
+                        "description": row.description,
+                        "components": tuple(row.components or ()),
+                    }
+                    for row in rows
+                ])
+                self.reloads += 1
+        finally:
+            db.close()
+        self._checked = time.monotonic()
+
+    def get(self, template_id: str) -> Optional[dict]:
+        return self.snapshot().by_id.get(template_id)
+
+    def invalidate(self):
+        """Check the version on the next read instead of waiting for the interval"""
+        self._checked = 0.0
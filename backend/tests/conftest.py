@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before anything imports database.py
+_database_dir = tempfile.mkdtemp(prefix="tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_database_dir, "tests.db")
+os.environ["ADMIN_TOKEN"] = "test-token"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def db():
+    """A database with the schema created and no projects"""
+    database.init_db()
+    with database.get_engine().begin() as conn:
+        conn.execute(database.Project.__table__.delete())
+    return database
@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def main(db):
+    import main
+
+    main.template_registry.invalidate()
+    return main
+
+
+def page_weight(main, prompt):
+    events = dict(main.generate_events(main.WebsiteRequest(prompt=prompt)))
+    return events["page_weight"]
+
+
+def test_critical_css_measures_exported_page(main, monkeypatch):
+    plain = page_weight(main, "a bakery website")
+    monkeypatch.setattr(main, "critical_css", main.CriticalCSS(main.ENHANCED_CSS))
+    critical = page_weight(main, "a bakery website with critical css")
+
+    # The exported page links style.css instead of the editor's inline copy
+    assert critical["render_blocking"]["stylesheets"] == 0
+    assert critical["render_blocking"]["inline_css_bytes"] < plain["render_blocking"]["inline_css_bytes"] / 2
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import gzip
+
+import orjson
+import pytest
+from sqlalchemy import func, select
+
+import project_dump
+
+
+def ndjson(*ids, newline=True) -> bytes:
+    lines = [
+        orjson.dumps({
+            "id": project_id,
+            "prompt": f"prompt {project_id}",
+            "style": "modern",
+            "html": "<p>page</p>",
+            "css": "",
+            "js": "",
+            "created_at": datetime(2024, 1, 1).isoformat(),
+        })
+        for project_id in ids
+    ]
+    return b"\n".join(lines) + (b"\n" if newline else b"")
+
+
+def stored_count(db) -> int:
+    with db.get_engine().connect() as conn:
+        return conn.execute(select(func.count()).select_from(db.Project.__table__)).scalar()
+
+
+def test_import_without_trailing_newline(db):
+    result = project_dump.import_stream([ndjson("a", "b", newline=False)])
+    assert result == {"lines": 2, "inserted": 2, "skipped": 0}
+    assert stored_count(db) == 2
+
+
+def test_import_batch_filled_by_last_line(db):
+    result = project_dump.import_stream([ndjson("a", "b", "c", newline=False)], batch_size=3)
+    assert result == {"lines": 3, "inserted": 3, "skipped": 0}
+    assert stored_count(db) == 3
+
+
+def test_import_endpoint_batch_filled_by_last_line(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    import main
+
+    batcher = project_dump.Batcher
+    monkeypatch.setattr(project_dump, "Batcher", lambda: batcher(max_rows=3))
+    response = TestClient(main.app).post(
+        "/api/projects/import", content=ndjson("a", "b", "c", newline=False),
+        headers={"x-admin-token": "test-token"},
+    )
+    assert response.json() == {"lines": 3, "inserted": 3, "skipped": 0}
+    assert stored_count(db) == 3
+
+
+def test_import_skips_existing_ids(db):
+    project_dump.import_stream([ndjson("a", "b")])
+    result = project_dump.import_stream([ndjson("b", "c")])
+    assert result == {"lines": 2, "inserted": 1, "skipped": 1}
+    assert stored_count(db) == 3
+
+
+def test_export_import_round_trip(db):
+    project_dump.import_stream([ndjson("a", "b", "c")])
+    dump = b"".join(project_dump.gzip_chunks(project_dump.export_rows()))
+    with db.get_engine().begin() as conn:
+        conn.execute(db.Project.__table__.delete())
+    result = project_dump.import_stream([dump[i:i + 7] for i in range(0, len(dump), 7)])
+    assert result == {"lines": 3, "inserted": 3, "skipped": 0}
+
+
+def test_reader_multi_member_gzip():
+    first = gzip.compress(ndjson("a", "b"))
+    dump = first + gzip.compress(ndjson("c", newline=False))
+    # Whole, in small chunks, and split exactly where the second member starts
+    for chunks in ([dump], [dump[i:i + 5] for i in range(0, len(dump), 5)], [first, dump[len(first):]]):
+        reader = project_dump.NDJSONReader()
+        records = []
+        for chunk in chunks:
+            records += reader.feed(chunk)
+        records += reader.close()
+        assert [record["id"] for record in records] == ["a", "b", "c"]
+
+
+def test_reader_truncated_gzip():
+    dump = gzip.compress(ndjson("a", "b"))
+    reader = project_dump.NDJSONReader()
+    reader.feed(dump[:-10])
+    with pytest.raises(ValueError):
+        reader.close()
+
+
+def test_import_concatenated_dumps(db):
+    dump = gzip.compress(ndjson("a", "b")) + gzip.compress(ndjson("b", "c"))
+    result = project_dump.import_stream([dump])
+    assert result == {"lines": 4, "inserted": 3, "skipped": 1}
@@ -0,0 +1,20 @@
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from static_files import PublishedFiles
+
+
+def test_missing_directory_is_not_found(tmp_path):
+    app = FastAPI()
+    directory = tmp_path / "sites"
+    app.mount("/sites", PublishedFiles(directory=str(directory), html=True, check_dir=False))
+    client = TestClient(app)
+    assert client.get("/sites/abc/").status_code == 404
+
+    os.makedirs(directory / "abc")
+    (directory / "abc" / "index.html").write_text("<p>hi</p>")
+    response = client.get("/sites/abc/")
+    assert response.status_code == 200
+    assert response.text == "<p>hi</p>"
@@ -0,0 +1,28 @@
+import logging
+
+import pytest
+
+
+@pytest.fixture
+def main(db):
+    import main
+
+    main.template_registry.invalidate()
+    return main
+
+
+def test_template_components_in_order(main):
+    assert main.template_components("portfolio") == ("navbar", "hero", "gallery", "about", "contact")
+
+
+@pytest.mark.parametrize("template", ["business", "ecommerce", "restaurant"])
+def test_unknown_component_keeps_default_sections(main, template, caplog):
+    main._unknown_components.clear()
+    with caplog.at_level(logging.WARNING, logger="main"):
+        assert main.template_components(template) is main.DEFAULT_COMPONENTS
+        main.template_components(template)
+    assert len(caplog.records) == len({record.getMessage() for record in caplog.records}) > 0
+
+    content = main.generate_website_content("a website", template)
+    names = [name for name, _ in main.render_components(content, template)]
+    assert names == ["navbar", "hero", "about", "contact"]
@@ -0,0 +1,51 @@
+from typing import Callable
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Named startup steps run once before the app reports itself ready
+
+    Steps run in the order they were added. A failing step is recorded and
+    leaves the app unready, so a load balancer polling ``/ready`` keeps
+    traffic away from a worker that could not reach its database.
+    """
+
+    def __init__(self):
+        self._steps = []
+        self.timings = {}
+        self.error = None
+        self.ready = False
+        self.started = None
+        self.finished = None
+
+    def step(self, name: str, fn: Callable[[], object]):
+        self._steps.append((name, fn))
+
+    def run(self):
+        self.started = time.perf_counter()
+        for name, fn in self._steps:
+            step_started = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                self.error = f"{name}: {e}"
+                logger.exception("warm-up step %s failed", name)
+                return
+            finally:
+                self.timings[name] = round((time.perf_counter() - step_started) * 1000, 3)
+        self.finished = time.perf_counter()
+        self.ready = True
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        if self.started is not None:
+            elapsed = round(((self.finished or time.perf_counter()) - self.started) * 1000, 3)
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "warmup_ms": elapsed,
+            "steps": self.timings,
+        }
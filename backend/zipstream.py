@@ -0,0 +1,117 @@
+"""ZIP archives written as a stream of byte chunks
+
+Each entry is compressed in full before its local header is written, so
+sizes and CRCs go straight into the headers and the output never has to be
+seeked or held in memory. Compressed entries are cached by the identity of
+their source string, or of the ``JoinedText`` a stored page is kept as: the
+stylesheet and script shared by every generated site are deflated once per
+process, and re-exporting a project reuses its compressed page.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Iterable, Iterator, Tuple
+import struct
+import threading
+import zlib
+
+from fastjson import as_text
+
+DEFLATED = 8
+UTF8_NAMES = 0x800
+VERSION = 20
+MAX_ENTRIES = 0xFFFF
+MAX_OFFSET = 0xFFFFFFFF
+
+
+class CompressedEntry:
+    __slots__ = ("crc", "size", "data")
+
+    def __init__(self, data: bytes, level: int):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        self.crc = zlib.crc32(data)
+        self.size = len(data)
+        self.data = compressor.compress(data) + compressor.flush()
+
+
+class CompressionCache:
+    """Byte-bounded LRU of compressed entries, keyed by source string identity"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, level: int = 6):
+        self.max_bytes = max_bytes
+        self.level = level
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> CompressedEntry:
+        key = id(text)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] is text:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+
+        entry = CompressedEntry(as_text(text).encode("utf-8"), self.level)
+        with self._lock:
+            self.misses += 1
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1].data)
+            # Holding the string keeps its id from being reused while cached
+            self._entries[key] = (text, entry)
+            self._bytes += len(entry.data)
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.data)
+        return entry
+
+
+compression_cache = CompressionCache()
+
+
+def _dos_time(when: datetime) -> Tuple[int, int]:
+    when = max(when, datetime(1980, 1, 1))
+    return (
+        (when.hour << 11) | (when.minute << 5) | (when.second // 2),
+        ((when.year - 1980) << 9) | (when.month << 5) | when.day,
+    )
+
+
+def stream_zip(files: Iterable[Tuple[str, str, datetime]],
+               cache: CompressionCache = compression_cache) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``(name, text, modified)`` files, one chunk per file
+
+    ``text`` is a string or a ``JoinedText``.
+
+    Archives are limited to 65,535 entries and 4 GB, the limits of ZIP
+    without the ZIP64 extensions.
+    """
+    directory = []
+    offset = 0
+    for name, text, modified in files:
+        if len(directory) >= MAX_ENTRIES:
+            raise ValueError("too many files for a ZIP archive")
+        entry = cache.get(text)
+        encoded_name = name.encode("utf-8")
+        dos_time, dos_date = _dos_time(modified)
+        header = struct.pack(
+            "<4s5H3L2H", b"PK\x03\x04", VERSION, UTF8_NAMES, DEFLATED, dos_time, dos_date,
+            entry.crc, len(entry.data), entry.size, len(encoded_name), 0,
+        )
+        directory.append(struct.pack(
+            "<4s6H3L5H2L", b"PK\x01\x02", VERSION, VERSION, UTF8_NAMES, DEFLATED, dos_time, dos_date,
+            entry.crc, len(entry.data), entry.size, len(encoded_name), 0, 0, 0, 0, 0o100644 << 16, offset,
+        ) + encoded_name)
+        chunk = header + encoded_name + entry.data
+        offset += len(chunk)
+        if offset > MAX_OFFSET:
+            raise ValueError("ZIP archive larger than 4 GB")
+        yield chunk
+
+    central = b"".join(directory)
+    yield central + struct.pack(
+        "<4s4H2LH", b"PK\x05\x06", 0, 0, len(directory), len(directory), len(central), offset, 0,
+    )
@@ -2,6 +2,15 @@
 
 import { useState } from 'react';
 
+// When set, generation goes straight to the FastAPI backend and streams progress
+const API_URL = process.env.NEXT_PUBLIC_API_URL;
+
+interface GenerationStage {
+  stage: string;
+  name?: string;
+  ms: number;
+}
+
 interface GeneratedWebsite {
   id: string;
   html: string;
@@ -70,12 +79,50 @@ function WebsitePreview({ website }: { website: GeneratedWebsite }) {
   );
 }
 
+function generateWithProgress(
+  body: { prompt: string; template: string | null; style: string },
+  onStage: (stage: GenerationStage) => void,
+  onFragment: (html: string) => void
+): Promise<GeneratedWebsite> {
+  return new Promise((resolve, reject) => {
+    const params = new URLSearchParams({ prompt: body.prompt, style: body.style });
+    if (body.template) {
+      params.set('template', body.template);
+    }
+
+    const source = new EventSource(`${API_URL}/api/generate/stream?${params}`);
+
+    for (const stage of ['analysis', 'component', 'assets', 'persisted']) {
+      source.addEventListener(stage, (event) => {
+        const data = JSON.parse((event as MessageEvent).data);
+        onStage({ stage, name: data.name, ms: data.ms });
+        if (stage === 'component') {
+          onFragment(data.html);
+        }
+      });
+    }
+
+    source.addEventListener('complete', (event) => {
+      source.close();
+      resolve(JSON.parse((event as MessageEvent).data));
+    });
+
+    source.addEventListener('error', (event) => {
+      source.close();
+      const data = (event as MessageEvent).data;
+      reject(new Error(data ? JSON.parse(data).detail : 'Lost connection while generating the website'));
+    });
+  });
+}
+
 export function WebsiteGenerator() {
   const [prompt, setPrompt] = useState('');
   const [selectedTemplate, setSelectedTemplate] = useState('custom');
   const [isGenerating, setIsGenerating] = useState(false);
   const [generatedWebsite, setGeneratedWebsite] = useState<GeneratedWebsite | null>(null);
   const [error, setError] = useState('');
+  const [stages, setStages] = useState<GenerationStage[]>([]);
+  const [partialHtml, setPartialHtml] = useState('');
 
   const handleGenerate = async () => {
     setError('');
@@ -86,24 +133,41 @@ export function WebsiteGenerator() {
     }
 
     setIsGenerating(true);
+    setGeneratedWebsite(null);
+    setStages([]);
+    setPartialHtml('');
 
-    try {
-      const response = await fetch('/api/generate-website', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          prompt: prompt.trim(),
-          template: selectedTemplate === 'custom' ? null : selectedTemplate,
-          style: 'modern'
-        }),
-      });
-
-      const data = await response.json();
+    const body = {
+      prompt: prompt.trim(),
+      template: selectedTemplate === 'custom' ? null : selectedTemplate,
+      style: 'modern'
+    };
 
-      if (!response.ok) {
-        throw new Error(data.error || 'Failed to generate website');
+    try {
+      let data: GeneratedWebsite;
+
+      if (API_URL) {
+        data = await generateWithProgress(
+          body,
+          (stage) => setStages((previous) => [...previous, stage]),
+          (html) => setPartialHtml((previous) => previous + html)
+        );
+      } else {
+        const response = await fetch('/api/generate-website', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify(body),
+        });
+
+        const json = await response.json();
+
+        if (!response.ok) {
+          throw new Error(json.error || 'Failed to generate website');
+        }
+
+        data = json;
       }
 
       setGeneratedWebsite(data);
@@ -275,6 +339,25 @@ Enjoy your new website!
             
             {generatedWebsite ? (
               <WebsitePreview website={generatedWebsite} />
+            ) : isGenerating && stages.length > 0 ? (
+              <div className="space-y-4">
+                <div className="border-2 border-gray-300 rounded-lg overflow-hidden shadow-lg">
+                  <iframe
+                    srcDoc={partialHtml}
+                    className="w-full bg-white"
+                    style={{ height: '400px' }}
+                    title="Partial Website Preview"
+                    sandbox=""
+                  />
+                </div>
+                <ul className="text-sm text-gray-600 space-y-1">
+                  {stages.map((stage, index) => (
+                    <li key={index}>
+                      {stage.name ? `${stage.stage}: ${stage.name}` : stage.stage} ({stage.ms.toFixed(1)} ms)
+                    </li>
+                  ))}
+                </ul>
+              </div>
             ) : (
               <div className="bg-gray-50 rounded-lg flex items-center justify-center border-2 border-dashed border-gray-300" style={{ height: '400px' }}>
                 <p className="text-gray-500 text-center px-4">